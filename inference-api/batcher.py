@@ -0,0 +1,124 @@
+import time
+import asyncio
+import threading
+from collections import deque
+import numpy as np
+
+
+class MicroBatcher:
+    """동시에 들어온 요청을 모아 한 번에 추론 (dynamic batching)
+
+    - 첫 요청이 들어오면 max_wait_ms 동안 또는 max_batch_size 개가 찰 때까지 모아서 실행
+    - 추론은 executor(스레드 풀)에서 돌고, 실행 슬롯이 모두 차 있으면 그동안 들어온 요청이 다음 배치로 쌓임
+    - run_batch(items) 는 items 순서대로 결과 리스트를 돌려줘야 함 (예외 객체인 항목은 그 요청에만 예외로 전달)
+    """
+
+    def __init__(self, run_batch, executor, slots, max_batch_size=16, max_wait_ms=10):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(slots)
+        self.batch_sizes = deque(maxlen=1000)
+        self.task = None
+        self.running = set()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 실행 슬롯이 빌 때까지 기다리는 동안에도 요청은 큐에 계속 쌓임
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # 이미 쌓여 있는 요청은 기다리지 않고 바로 가져옴
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 태스크 참조를 들고 있지 않으면 실행 중에 GC될 수 있음
+            task = asyncio.create_task(self._execute(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _execute(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.batch_sizes.append(len(batch))
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, items)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+    def stats(self):
+        sizes = list(self.batch_sizes)
+        return {
+            "batches": len(sizes),
+            "avg_batch_size": float(np.mean(sizes)) if sizes else 0.0,
+            "largest_batch": max(sizes) if sizes else 0,
+            "queued": self.queue.qsize(),
+        }
+
+
+class LatencyStats:
+    """최근 window 개 요청의 지연시간(ms) 백분위수"""
+
+    def __init__(self, window=2000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, start):
+        with self.lock:
+            self.samples.append((time.perf_counter() - start) * 1000)
+            self.count += 1
+
+    def summary(self):
+        with self.lock:
+            samples = np.array(self.samples)
+            count = self.count
+        if not len(samples):
+            return {"count": count}
+        p50, p90, p95, p99 = np.percentile(samples, [50, 90, 95, 99]).tolist()
+        return {
+            "count": count,
+            "p50_ms": round(p50, 2),
+            "p90_ms": round(p90, 2),
+            "p95_ms": round(p95, 2),
+            "p99_ms": round(p99, 2),
+            "max_ms": round(float(samples.max()), 2),
+        }
@@ -0,0 +1,77 @@
+# loadtest.py
+# inference-api 부하 테스트 (MLflow 없이 랜덤 weights 모델로 batching / 지연시간만 측정)
+#   pip install httpx
+#   python loadtest.py --requests 500 --concurrency 32 --task unet
+
+import io
+import time
+import asyncio
+import argparse
+
+import httpx
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import models as tv_models
+from unet import UNet
+import main as service
+from main import app
+
+RUN_ID = "0" * 32
+ENDPOINTS = {"unet": "/segment", "classifier": "/classify"}
+
+
+def fake_model(task):
+    if task == "unet":
+        return UNet().eval()
+    model = tv_models.resnet18(num_classes=len(service.CLASSES))
+    return model.eval()
+
+
+def make_png(size=512):
+    buf = io.BytesIO()
+    Image.fromarray((np.random.rand(size, size) * 255).astype(np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+async def run(task, total, concurrency):
+    png = make_png()
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://test", timeout=300) as http:
+        async def one():
+            async with sem:
+                resp = await http.post(
+                    ENDPOINTS[task], params={"run_id": RUN_ID},
+                    files={"file": ("x.png", png, "image/png")},
+                )
+                resp.raise_for_status()
+
+        await one()  # 모델 로드 / warm-up
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(total)])
+        elapsed = time.perf_counter() - start
+        stats = (await http.get("/metrics")).json()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--task", type=str, default="unet", choices=list(ENDPOINTS))
+    args = parser.parse_args()
+
+    service.models.loader = lambda run_id: fake_model(args.task)
+    elapsed, stats = asyncio.run(run(args.task, args.requests, args.concurrency))
+
+    endpoint = ENDPOINTS[args.task].strip("/")
+    print(f"[INFO] {args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s, "
+          f"torch threads {torch.get_num_threads()})")
+    print(f"[INFO] latency: {stats['latency'][endpoint]}")
+    print(f"[INFO] batching: {stats['batching'][args.task]}")
+
+
+if __name__ == "__main__":
+    main()
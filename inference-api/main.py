@@ -0,0 +1,209 @@
+import io
+import os
+import time
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import numpy as np
+import torch
+import torch.nn as nn
+import mlflow
+from PIL import Image, UnidentifiedImageError
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import Response
+from dotenv import load_dotenv
+from predict import PRESETS, load_model
+from model_cache import ModelCache
+from batcher import MicroBatcher, LatencyStats
+
+# 환경변수 로드
+load_dotenv()
+
+# 기본 모델 (요청에 run_id가 없으면 사용)
+DEFAULT_RUN_IDS = {
+    "unet": os.getenv("UNET_RUN_ID"),
+    "classifier": os.getenv("CLASSIFIER_RUN_ID"),
+}
+CLASSES = os.getenv("CLASSIFIER_CLASSES", "NORMAL,PNEUMONIA").split(",")
+MASK_THRESHOLD = float(os.getenv("MASK_THRESHOLD", 0.5))
+
+MAX_MODELS = int(os.getenv("MAX_MODELS", 4))
+# 로드 실패한 run id(없는 run 등)는 이 시간 동안 MLflow에 다시 묻지 않고 바로 실패
+MODEL_FAILURE_TTL = float(os.getenv("MODEL_FAILURE_TTL", 30))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 16))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", 10))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+# 추론 스레드끼리 코어를 나눠 쓰도록 (기본: 코어 수 / 워커 수)
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS)))
+
+RUN_ID_PATTERN = r"^[0-9a-f]{32}$"
+
+mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://mlflow-service:5000"))
+torch.set_num_threads(TORCH_THREADS)
+
+device = torch.device("cpu")
+models = ModelCache(lambda run_id: load_model(run_id, device), max_models=MAX_MODELS, failure_ttl=MODEL_FAILURE_TTL)
+latency = defaultdict(LatencyStats)
+
+# task별 출력 rank - unet: (B, 1, H, W) mask logits, classifier: (B, classes) logits
+OUTPUT_DIMS = {"unet": 4, "classifier": 2}
+
+
+class TaskMismatch(ValueError):
+    """다른 task의 run id (예: /segment에 classifier run) → 422"""
+
+
+def input_channels(model):
+    # 첫 conv의 입력 채널 (TorchScript / ONNX처럼 모듈을 볼 수 없으면 None)
+    modules = model.modules() if isinstance(model, nn.Module) else []
+    return next((m.in_channels for m in modules if isinstance(m, nn.Conv2d)), None)
+
+
+def make_runner(task):
+    """배치 실행 함수: 같은 run id끼리 묶어서 한 번에 forward
+
+    run id 하나가 실패해도(로드 실패 / forward 에러) 그 run id 요청만 예외를 받고 나머지는 정상 결과
+    """
+
+    def run_batch(items):
+        results = [None] * len(items)
+        groups = defaultdict(list)
+        for i, (run_id, _) in enumerate(items):
+            groups[run_id].append(i)
+
+        for run_id, indices in groups.items():
+            try:
+                model = models.get(run_id)
+                x = torch.stack([items[i][1] for i in indices])
+                # 입력 채널이 다르면 forward가 shape 에러로 죽으므로 먼저 확인 (unet 1채널 / classifier 3채널)
+                channels = input_channels(model)
+                if channels is not None and channels != x.size(1):
+                    raise TaskMismatch(f"run {run_id} expects {channels}-channel input, not a {task} model")
+                with torch.inference_mode():
+                    out = model(x).float()
+                if out.dim() != OUTPUT_DIMS[task]:
+                    raise TaskMismatch(f"run {run_id} returned a {out.dim()}-D output, not a {task} model")
+            except Exception as e:
+                for i in indices:
+                    results[i] = e
+                continue
+            for i, o in zip(indices, out):
+                results[i] = o
+        return results
+
+    return run_batch
+
+
+def preload(run_id):
+    try:
+        models.get(run_id)
+    except Exception as e:
+        print(f"[WARN] Failed to preload model {run_id}: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="infer")
+    app.state.batchers = {
+        task: MicroBatcher(make_runner(task), executor, slots=INFERENCE_WORKERS,
+                           max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+        for task in PRESETS
+    }
+    for batcher in app.state.batchers.values():
+        batcher.start()
+
+    # 기본 모델은 첫 요청 전에 미리 로드
+    for run_id in DEFAULT_RUN_IDS.values():
+        if run_id:
+            asyncio.get_running_loop().run_in_executor(executor, preload, run_id)
+
+    yield
+    for batcher in app.state.batchers.values():
+        await batcher.stop()
+    executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
+
+TRANSFORMS = {task: preset["transform"](preset["image_size"]) for task, preset in PRESETS.items()}
+
+
+def decode(data, task):
+    """업로드 bytes → (모델 입력 텐서, 원본 크기)"""
+    image = Image.open(io.BytesIO(data))
+    size = image.size
+    image.draft("L", (PRESETS[task]["image_size"],) * 2)
+    return TRANSFORMS[task](image.convert("L")), size
+
+
+def encode_mask(logits, size):
+    prob = torch.sigmoid(logits[0]).numpy()
+    mask = Image.fromarray(((prob >= MASK_THRESHOLD) * 255).astype(np.uint8)).resize(size, Image.NEAREST)
+    buf = io.BytesIO()
+    mask.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+async def infer(task, run_id, file):
+    run_id = run_id or DEFAULT_RUN_IDS[task]
+    if not run_id:
+        raise HTTPException(status_code=400, detail=f"run_id is required (no default {task} model)")
+
+    data = await file.read()
+    try:
+        # 디코딩 / 리사이즈는 이벤트 루프를 막지 않도록 스레드에서
+        x, size = await asyncio.to_thread(decode, data, task)
+    except (UnidentifiedImageError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid image: {e}")
+
+    try:
+        out = await app.state.batchers[task].submit((run_id, x))
+    except TaskMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"inference failed for run {run_id}: {e}")
+    return out, size, run_id
+
+
+@app.post("/segment")
+async def segment(file: UploadFile = File(...), run_id: str = Query(None, pattern=RUN_ID_PATTERN)):
+    start = time.perf_counter()
+    out, size, run_id = await infer("unet", run_id, file)
+    png = await asyncio.to_thread(encode_mask, out, size)
+    latency["segment"].record(start)
+    return Response(content=png, media_type="image/png", headers={"X-Run-Id": run_id})
+
+
+@app.post("/classify")
+async def classify(file: UploadFile = File(...), run_id: str = Query(None, pattern=RUN_ID_PATTERN)):
+    start = time.perf_counter()
+    out, _, run_id = await infer("classifier", run_id, file)
+    probs = torch.softmax(out, dim=0).tolist()
+    pred = int(np.argmax(probs))
+    latency["classify"].record(start)
+    return {
+        "run_id": run_id,
+        "prediction": CLASSES[pred] if pred < len(CLASSES) else pred,
+        "probabilities": {CLASSES[i] if i < len(CLASSES) else str(i): p for i, p in enumerate(probs)},
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "latency": {endpoint: stats.summary() for endpoint, stats in latency.items()},
+        "batching": {task: batcher.stats() for task, batcher in app.state.batchers.items()},
+        "models": models.stats(),
+        "config": {
+            "max_batch_size": MAX_BATCH_SIZE,
+            "max_wait_ms": MAX_WAIT_MS,
+            "inference_workers": INFERENCE_WORKERS,
+            "torch_threads": TORCH_THREADS,
+        },
+    }
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
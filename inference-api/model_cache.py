@@ -0,0 +1,72 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ModelCache:
+    """run id → 로드된 모델 LRU 캐시
+
+    - max_models 개를 넘으면 가장 오래 안 쓴 모델부터 해제
+    - 같은 run id를 여러 요청이 동시에 요청해도 로드는 한 번만
+    - 로드 실패는 failure_ttl초 동안 기억해서 같은 run id 요청은 다시 로드하지 않고 같은 예외를 냄
+    """
+
+    def __init__(self, loader, max_models=4, failure_ttl=30):
+        self.loader = loader
+        self.max_models = max_models
+        self.failure_ttl = failure_ttl
+        self.models = OrderedDict()
+        self.loading = {}   # run_id → threading.Event
+        self.failures = {}  # run_id → (예외, 만료 시각)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, run_id):
+        while True:
+            with self.lock:
+                if run_id in self.models:
+                    self.models.move_to_end(run_id)
+                    self.hits += 1
+                    return self.models[run_id]
+                failure = self.failures.get(run_id)
+                if failure and failure[1] > time.time():
+                    raise failure[0]
+                event = self.loading.get(run_id)
+                if event is None:
+                    # 이 스레드가 로드 담당
+                    event = self.loading[run_id] = threading.Event()
+                    self.misses += 1
+                    break
+            # 다른 스레드가 로드 중 → 끝날 때까지 기다렸다가 다시 확인 (실패했으면 이번엔 직접 로드)
+            event.wait()
+
+        try:
+            model = self.loader(run_id)
+        except Exception as e:
+            with self.lock:
+                now = time.time()
+                # 만료된 항목 정리 (없는 run id가 계속 들어와도 커지지 않도록)
+                self.failures = {k: v for k, v in self.failures.items() if v[1] > now}
+                self.failures[run_id] = (e, now + self.failure_ttl)
+                self.loading.pop(run_id).set()
+            raise
+
+        with self.lock:
+            self.models[run_id] = model
+            while len(self.models) > self.max_models:
+                evicted, _ = self.models.popitem(last=False)
+                print(f"[INFO] Evicted model {evicted}")
+            self.loading.pop(run_id).set()
+        print(f"[INFO] Loaded model {run_id} ({len(self.models)}/{self.max_models} cached)")
+        return model
+
+    def stats(self):
+        with self.lock:
+            return {
+                "cached": list(self.models),
+                "max_models": self.max_models,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failed": [run_id for run_id, (_, until) in self.failures.items() if until > time.time()],
+            }
@@ -0,0 +1,134 @@
+import time
+import queue
+import threading
+from mlflow_lookup import make_session
+
+COMMENT_TTL = 14 * 24 * 3600
+
+
+class CommentDispatcher:
+    """PR 코멘트를 워커 스레드 풀에서 비동기로 게시
+
+    - Job마다 코멘트 하나만 만들고 이후 상태는 같은 코멘트를 수정(PATCH)
+    - 같은 Job에 대해 아직 보내지 못한 업데이트가 쌓이면 마지막 내용만 보냄
+    - X-RateLimit-* / Retry-After 헤더를 보고 모든 워커가 같이 대기
+    """
+
+    def __init__(self, repo, token, base_url="https://api.github.com", workers=4, max_attempts=5):
+        self.repo = repo
+        self.base_url = base_url
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json"
+        }
+        self.workers = workers
+        self.max_attempts = max_attempts
+        # POST/PATCH 상태 코드 재시도는 여기서 직접 처리 (세션은 연결 실패만 재시도)
+        self.session = make_session(frozenset(["GET"]), pool_size=workers)
+        self.r = None
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = {}   # job_name → (pr_number, body)
+        self.active = set()
+        self.comment_ids = {}
+        self.pause_until = 0
+
+    def start(self, r=None):
+        # r가 있으면 코멘트 id를 Redis에도 저장해서 재시작 후에도 같은 코멘트를 수정
+        self.r = r
+        for _ in range(self.workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, pr_number, job_name, body):
+        with self.lock:
+            scheduled = job_name in self.pending or job_name in self.active
+            self.pending[job_name] = (pr_number, body)
+            if not scheduled:
+                self.queue.put(job_name)
+
+    def _run(self):
+        while True:
+            job_name = self.queue.get()
+            with self.lock:
+                pr_number, body = self.pending.pop(job_name)
+                self.active.add(job_name)
+            try:
+                self.send(pr_number, job_name, body)
+            except Exception as e:
+                print(f"❌ 코멘트 실패 (PR #{pr_number}, {job_name}): {e}")
+            finally:
+                with self.lock:
+                    self.active.discard(job_name)
+                    # 처리하는 동안 새 업데이트가 들어왔으면 다시 큐에
+                    if job_name in self.pending:
+                        self.queue.put(job_name)
+
+    def get_comment_id(self, job_name):
+        comment_id = self.comment_ids.get(job_name)
+        if comment_id is None and self.r is not None:
+            comment_id = self.r.get(f"github:comment:{job_name}")
+        return comment_id
+
+    def save_comment_id(self, job_name, comment_id):
+        self.comment_ids[job_name] = comment_id
+        if self.r is not None:
+            self.r.set(f"github:comment:{job_name}", comment_id, ex=COMMENT_TTL)
+
+    def wait_rate_limit(self):
+        delay = self.pause_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def update_rate_limit(self, resp):
+        """응답 헤더로 다음 요청 가능 시각 갱신 → 이번 요청을 다시 보내야 하면 True"""
+        retry_after = resp.headers.get("Retry-After")
+        remaining = resp.headers.get("X-RateLimit-Remaining")
+        reset = resp.headers.get("X-RateLimit-Reset")
+
+        until = 0
+        if retry_after:
+            until = time.time() + float(retry_after)
+        elif remaining == "0" and reset:
+            until = float(reset)
+        if until:
+            with self.lock:
+                self.pause_until = max(self.pause_until, until)
+        return resp.status_code == 429 or (resp.status_code == 403 and until > 0)
+
+    def send(self, pr_number, job_name, body):
+        for attempt in range(self.max_attempts):
+            self.wait_rate_limit()
+            comment_id = self.get_comment_id(job_name)
+            if comment_id:
+                resp = self.session.patch(
+                    f"{self.base_url}/repos/{self.repo}/issues/comments/{comment_id}",
+                    json={"body": body}, headers=self.headers, timeout=10
+                )
+            else:
+                resp = self.session.post(
+                    f"{self.base_url}/repos/{self.repo}/issues/{pr_number}/comments",
+                    json={"body": body}, headers=self.headers, timeout=10
+                )
+            # 성공 응답이어도 남은 한도가 0이면 다음 요청부터 대기
+            rate_limited = self.update_rate_limit(resp)
+
+            if resp.status_code in (200, 201):
+                if not comment_id:
+                    self.save_comment_id(job_name, resp.json()["id"])
+                print(f"✅ PR #{pr_number} 코멘트 {'수정' if comment_id else '등록'} 완료 ({job_name})")
+                return
+            if comment_id and resp.status_code == 404:
+                # 코멘트가 삭제된 경우 새로 작성
+                self.comment_ids.pop(job_name, None)
+                if self.r is not None:
+                    self.r.delete(f"github:comment:{job_name}")
+                continue
+            if rate_limited or resp.status_code >= 500:
+                # rate limit 헤더가 없는 5xx는 지수 백오프
+                with self.lock:
+                    self.pause_until = max(self.pause_until, time.time() + 2 ** attempt)
+                continue
+            print(f"❌ 코멘트 실패 {resp.status_code}: {resp.text}")
+            return
+        print(f"❌ 코멘트 실패 (재시도 {self.max_attempts}회 초과): PR #{pr_number} {job_name}")
@@ -0,0 +1,80 @@
+import time
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+
+class JobInformer:
+    """list + watch 루프 (resourceVersion 이어받기, 410 Gone이면 다시 list)
+
+    handler(event_type, job) 는 다음 이벤트로 호출됨
+      SYNC     - list로 받은 Job (시작 / 재동기화 시)
+      ADDED / MODIFIED / DELETED - watch 이벤트
+    """
+
+    def __init__(self, batch_v1, namespace, label_selector, handler, watch_timeout=300):
+        self.batch_v1 = batch_v1
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.handler = handler
+        self.watch_timeout = watch_timeout
+        self.jobs = {}
+
+    def list(self):
+        jobs = self.batch_v1.list_namespaced_job(namespace=self.namespace, label_selector=self.label_selector)
+        seen = set()
+        for job in jobs.items:
+            seen.add(job.metadata.name)
+            self.jobs[job.metadata.name] = job
+            self.handler("SYNC", job)
+        # watch가 끊긴 사이 삭제된 Job
+        for name in list(self.jobs):
+            if name not in seen:
+                self.handler("DELETED", self.jobs.pop(name))
+        print(f"[INFO] Synced {len(jobs.items)} job(s) at resourceVersion {jobs.metadata.resource_version}")
+        return jobs.metadata.resource_version
+
+    def watch(self, resource_version):
+        watcher = watch.Watch()
+        for event in watcher.stream(
+            self.batch_v1.list_namespaced_job,
+            namespace=self.namespace,
+            label_selector=self.label_selector,
+            resource_version=resource_version,
+            timeout_seconds=self.watch_timeout,
+            allow_watch_bookmarks=True,
+        ):
+            event_type = event["type"]
+            if event_type == "ERROR":
+                code = event["raw_object"].get("code")
+                raise ApiException(status=code, reason=event["raw_object"].get("message"))
+
+            job = event["object"]
+            resource_version = job.metadata.resource_version
+            if event_type == "BOOKMARK":
+                continue
+
+            if event_type == "DELETED":
+                self.jobs.pop(job.metadata.name, None)
+            else:
+                self.jobs[job.metadata.name] = job
+            self.handler(event_type, job)
+        # timeout으로 끝나면 마지막 resourceVersion부터 다시 watch
+        return resource_version
+
+    def run(self):
+        resource_version = None
+        while True:
+            try:
+                if resource_version is None:
+                    resource_version = self.list()
+                resource_version = self.watch(resource_version)
+            except ApiException as e:
+                if e.status == 410:
+                    print("[INFO] resourceVersion 만료(410 Gone) → 재동기화")
+                    resource_version = None
+                else:
+                    print(f"[ERROR] Watch 실패: {e}")
+                    time.sleep(5)
+            except Exception as e:
+                print(f"[ERROR] Watch 실패: {e}")
+                time.sleep(5)
@@ -0,0 +1,95 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def make_session(retry_methods, pool_size=16):
+    """커넥션 재사용 + 재시도(429/5xx, Retry-After 존중) 세션"""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=retry_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class MlflowLookup:
+    """experiment 이름 → id TTL 캐시 + run 일괄 조회"""
+
+    def __init__(self, base_url, ttl=600):
+        self.base_url = base_url
+        self.ttl = ttl
+        # search API는 조회용 POST라 재시도해도 안전
+        self.session = make_session(frozenset(["GET", "POST"]))
+        self._experiments = {}
+        self._lock = threading.Lock()
+
+    def experiment_id(self, name):
+        now = time.time()
+        with self._lock:
+            hit = self._experiments.get(name)
+            if hit and hit[1] > now:
+                return hit[0]
+
+        resp = self.session.get(
+            f"{self.base_url}/api/2.0/mlflow/experiments/get-by-name",
+            params={"experiment_name": name},
+            timeout=5
+        )
+        resp.raise_for_status()
+        experiment_id = resp.json()["experiment"]["experiment_id"]
+
+        with self._lock:
+            # 만료된 항목 정리
+            self._experiments = {k: v for k, v in self._experiments.items() if v[1] > now}
+            self._experiments[name] = (experiment_id, now + self.ttl)
+        return experiment_id
+
+    def find_runs(self, experiment_id, job_names, since_ms=None):
+        """job_name 태그별 최신 run을 runs/search 한 번으로 조회 → {job_name: run}"""
+        job_names = set(job_names)
+        body = {
+            "experiment_ids": [experiment_id],
+            "order_by": ["attributes.start_time DESC"],
+        }
+        if len(job_names) == 1:
+            body["filter"] = f'tags.job_name = "{next(iter(job_names))}"'
+            body["max_results"] = 1
+        else:
+            # 태그 IN 필터는 지원되지 않으므로 가장 오래된 Job 생성 시각 이후 run을 한 번에 가져와서 매칭
+            if since_ms:
+                body["filter"] = f"attributes.start_time >= {int(since_ms)}"
+            body["max_results"] = 1000
+
+        runs = {}
+        # sweep 등으로 run이 1000개를 넘으면 모든 Job의 run을 찾거나 페이지가 끝날 때까지 다음 페이지
+        while True:
+            resp = self.session.post(f"{self.base_url}/api/2.0/mlflow/runs/search", json=body, timeout=10)
+            resp.raise_for_status()
+            page = resp.json()
+            for run in page.get("runs", []):
+                tags = {t["key"]: t["value"] for t in run.get("data", {}).get("tags", [])}
+                job_name = tags.get("job_name")
+                # start_time 내림차순이므로 처음 나온 run이 최신
+                if job_name in job_names and job_name not in runs:
+                    runs[job_name] = run
+            if len(job_names) == 1 or runs.keys() >= job_names or not page.get("next_page_token"):
+                return runs
+            body["page_token"] = page["next_page_token"]
+
+    def set_tag(self, run_id, key, value):
+        resp = self.session.post(
+            f"{self.base_url}/api/2.0/mlflow/runs/set-tag",
+            json={"run_id": run_id, "key": key, "value": value},
+            timeout=5
+        )
+        resp.raise_for_status()
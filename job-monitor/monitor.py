@@ -1,6 +1,12 @@
-from kubernetes import client, config, watch
+from kubernetes import client, config
 from dotenv import load_dotenv
-import requests
+from mlflow_lookup import MlflowLookup
+from github_notifier import CommentDispatcher
+from informer import JobInformer
+import queue
+import threading
+import redis
+import json
 import os
 import time
 
@@ -10,9 +16,25 @@ NAMESPACE = 'default'
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
 MLFLOW_URL = "http://mlflow-service:5000"
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+STATUS_TTL = 14 * 24 * 3600
+# 완료 Job을 모아서 run 조회를 한 번에 하기 위한 대기 시간(초)
+FLUSH_INTERVAL = 2
+# 결과 캐시 (train-worker result_cache.py와 같은 키)
+#   result_cache:<key>   성공한 Job의 run 정보 - worker가 같은 key 요청을 Job 없이 처리
+#   result_cache:hits    worker가 캐시로 처리한 요청 → PR 코멘트
+RESULT_CACHE_PREFIX = "result_cache"
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 30 * 24 * 3600))
+# 끝까지 (또는 스스로 early stop으로) 학습한 run만 캐시 - pruned는 같은 sweep의 다른 trial에 따라 잘린 결과
+CACHEABLE_STOP_REASONS = {"completed", "patience", "time_budget"}
 print("TOKEN:", GITHUB_TOKEN[:10] + "..." if GITHUB_TOKEN else "None")
 print("REPO:", GITHUB_REPO)
 
+mlflow_lookup = MlflowLookup(MLFLOW_URL)
+# PR 코멘트는 Job마다 하나만 만들고 상태가 바뀌면 수정 (watch 루프를 막지 않도록 별도 스레드에서 전송)
+github = CommentDispatcher(GITHUB_REPO, GITHUB_TOKEN, workers=int(os.getenv("GITHUB_WORKERS", 4)))
+
 def get_container_image(job):
     """Job에서 컨테이너 이미지 추출"""
     try:
@@ -20,6 +42,23 @@ def get_container_image(job):
     except:
         return "unknown"
 
+def get_gpu_count(job):
+    """trainer 컨테이너의 nvidia.com/gpu limit (템플릿마다 다름)"""
+    try:
+        limits = job.spec.template.spec.containers[0].resources.limits or {}
+        return int(limits.get("nvidia.com/gpu", 0))
+    except Exception:
+        return 0
+
+def get_dataset_claim(job):
+    try:
+        for volume in job.spec.template.spec.volumes or []:
+            if volume.persistent_volume_claim:
+                return volume.persistent_volume_claim.claim_name
+    except Exception:
+        pass
+    return "unknown"
+
 def extract_hyperparameters(job):
     """Job args에서 하이퍼파라미터 추출"""
     try:
@@ -33,51 +72,34 @@ def extract_hyperparameters(job):
     except:
         return {}
 
-def comment_pr(pr_number: int, job_name: str, status: str, job=None):
-    # GitHub 코멘트 API
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/issues/{pr_number}/comments"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json"
-    }
+def get_experiment_name(job):
+    """Job 라벨 또는 컨테이너 env(experiment_name)에서 MLflow experiment 이름 추출"""
+    name = (job.metadata.labels or {}).get("experiment_name")
+    if name:
+        return name
+    try:
+        for env in job.spec.template.spec.containers[0].env or []:
+            if env.name == "experiment_name":
+                return env.value
+    except Exception:
+        pass
+    return None
 
-    run_id = None
-    artifact_url = None
-    experiment_name = job.metadata.labels.get("experiment_name")
-    
-    #동적으로 experiment_id 찾기 mlflow에서 찾기
-    mlflow_resp = requests.post(
-                f"{MLFLOW_URL}/api/2.0/mlflow/experiments/search",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "experiment_name": experiment_name
-                },
-                timeout=5
-            )
-    mlflow_resp.raise_for_status()
-    experiment_id = mlflow_resp.json()["experiments"][0]["experiment_id"]
-        
-
-    # ✅ MLflow에서 Run 찾기 (성공/실패일 때만 조회 시도)
-    if status in ("success", "failure"):
-        try:
-            mlflow_resp = requests.post(
-                f"{MLFLOW_URL}/api/2.0/mlflow/runs/search",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "experiment_ids": [experiment_id],
-                    "filter": f'tags.job_name = "{job_name}"',
-                    "max_results": 1,
-                    "order_by": ["attributes.start_time DESC"]
-                },
-                timeout=5
-            )
-            mlflow_resp.raise_for_status()
-            run = mlflow_resp.json()["runs"][0]
-            run_id = run["info"]["run_id"]
-            artifact_url = run["info"]["artifact_uri"]
-        except Exception as e:
-            print(f"[WARN] MLflow 검색 실패: {e}")
+def lookup_experiment_id(job):
+    """experiment id (TTL 캐시, 실패 시 None)"""
+    name = get_experiment_name(job)
+    if not name:
+        return None
+    try:
+        return mlflow_lookup.experiment_id(name)
+    except Exception as e:
+        print(f"[WARN] MLflow experiment 조회 실패 ({name}): {e}")
+        return None
+
+def comment_pr(pr_number: int, job_name: str, status: str, job=None, experiment_id=None, run=None, key=None):
+    # MLflow run 정보 (성공/실패일 때 FinishedJobNotifier가 일괄 조회해서 넘겨줌)
+    run_id = run["info"]["run_id"] if run else None
+    artifact_url = run["info"]["artifact_uri"] if run else None
 
     # 코멘트 내용 구성
     now = time.strftime('%Y-%m-%d %H:%M:%S KST')
@@ -89,9 +111,11 @@ def comment_pr(pr_number: int, job_name: str, status: str, job=None):
 - **Time:** {now}
 
 ### 🔧 Configuration
-- **GPU:** 1x NVIDIA GPU
+- **GPU:** {f"{get_gpu_count(job)}x NVIDIA GPU" if get_gpu_count(job) else "CPU only"}{f" × {job.spec.completions} pods" if (job.spec.completions or 1) > 1 else ""}
+- **World size:** {(job.metadata.labels or {}).get("world-size", "1")}
+- **Template:** `{(job.metadata.labels or {}).get("job-template", "default")}`
 - **Image:** `{get_container_image(job)}`
-- **Dataset:** `/data` (training-data-pvc-v2)
+- **Dataset:** `/data` ({get_dataset_claim(job)})
 - **Namespace:** `{job.metadata.namespace}`
 - **MLflow Experiment:** [{experiment_id}](http://localhost:30002/#/experiments/{experiment_id})
 """
@@ -114,6 +138,21 @@ def comment_pr(pr_number: int, job_name: str, status: str, job=None):
             body += f"- **Model Artifacts:** `{artifact_url}`\n"
         body += "- **Next Steps:** 🔍 Review metrics and approve for deployment\n"
 
+    elif status == "cached":
+        cached_from = job.get("k8s_job") if job else None
+        body = f"""### ♻️ Training **CACHED**
+- **Job name:** `{job_name}`
+- **Time:** {now}
+
+### 🎉 Results
+- **Status:** Same image, command, parameters and dataset already trained successfully - no new GPU job
+- **MLflow Run:** [View Detailed Results]({MLFLOW_URL}/#/experiments/{experiment_id}/runs/{run_id})\n"""
+        if cached_from:
+            body += f"- **Original Job:** `{cached_from}`\n"
+        if artifact_url:
+            body += f"- **Model Artifacts:** `{artifact_url}`\n"
+        body += "- **Next Steps:** Re-trigger with `\"force\": true` to train again\n"
+
     elif status == "failure":
         body = f"""### ❌ Training **FAILED**
 - **Job name:** `{job_name}`
@@ -137,12 +176,62 @@ def comment_pr(pr_number: int, job_name: str, status: str, job=None):
 - **Time:** {now}
 """
 
-    # GitHub 코멘트 등록
-    resp = requests.post(url, json={"body": body}, headers=headers, timeout=10)
-    if resp.status_code == 201:
-        print(f"✅ PR #{pr_number}에 '{status}' 코멘트 완료")
-    else:
-        print(f"❌ 코멘트 실패 {resp.status_code}: {resp.text}")
+    # GitHub 코멘트 등록 / 수정 (비동기) - key가 다르면 같은 Job 이름이어도 새 코멘트
+    github.submit(pr_number, key or job_name, body)
+    return run_id
+
+def update_job_status(r, job, state, **fields):
+    """job:<job_id> 상태 해시 갱신 (train-api GET /jobs 에서 조회)"""
+    job_id = (job.metadata.labels or {}).get("job-id")
+    if not job_id:
+        return
+    key = f"job:{job_id}"
+    now = time.time()
+    try:
+        pipe = r.pipeline()
+        pipe.hset(key, mapping={"state": state, "updated_at": now, "k8s_job": job.metadata.name, **fields})
+        pipe.hsetnx(key, f"{state}_at", now)
+        pipe.expire(key, STATUS_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"[WARN] 상태 갱신 실패 ({job_id}): {e}")
+
+def record_result(r, job, experiment_id, run):
+    """성공한 Job의 run을 결과 캐시에 기록 + run에 cache_key 태그 (Redis 항목이 만료돼도 MLflow에서 찾을 수 있게)"""
+    key = (job.metadata.labels or {}).get("cache-key")
+    if not key or not run:
+        return
+    tags = {t["key"]: t["value"] for t in run.get("data", {}).get("tags", [])}
+    if tags.get("stop_reason") not in CACHEABLE_STOP_REASONS:
+        print(f"[INFO] 결과 캐시 제외 ({job.metadata.name}): stop_reason={tags.get('stop_reason')}")
+        return
+    record = {
+        "run_id": run["info"]["run_id"],
+        "experiment_id": experiment_id or "",
+        "artifact_uri": run["info"].get("artifact_uri", ""),
+        "k8s_job": job.metadata.name,
+        "job_id": (job.metadata.labels or {}).get("job-id", ""),
+        "cached_at": time.time(),
+    }
+    try:
+        pipe = r.pipeline()
+        pipe.hset(f"{RESULT_CACHE_PREFIX}:{key}", mapping=record)
+        pipe.expire(f"{RESULT_CACHE_PREFIX}:{key}", RESULT_CACHE_TTL)
+        pipe.execute()
+        mlflow_lookup.set_tag(record["run_id"], "cache_key", key)
+    except Exception as e:
+        print(f"[WARN] 결과 캐시 기록 실패 ({job.metadata.name}): {e}")
+
+def job_state(status):
+    for condition in status.conditions or []:
+        if condition.status == "True" and condition.type == "Complete":
+            return "succeeded"
+        if condition.status == "True" and condition.type == "Failed":
+            return "failed"
+    if status.active:
+        return "running"
+    return None
+
 def mark_job_annotation(batch_v1, job, annotation_key):
     """Job에 어노테이션 추가 (중복 방지용)"""
     try:
@@ -160,63 +249,176 @@ def mark_job_annotation(batch_v1, job, annotation_key):
     except Exception as e:
         print(f"어노테이션 추가 실패: {e}")
 
-def main():
-    try:
-        config.load_incluster_config()
-        print("Loaded kube config from within the cluster.")
-    except Exception as e:
-        config.load_kube_config()
-        print("Loaded kube config from local machine.")    
+class FinishedJobNotifier(threading.Thread):
+    """완료(성공/실패) Job 알림을 모아서 처리 - experiment별 runs/search 한 번으로 run 조회"""
 
-    batch_v1 = client.BatchV1Api()
-    watcher = watch.Watch()
-    
-    print(f"👀 {NAMESPACE} 네임스페이스 Job 감시 시작...")
+    def __init__(self, batch_v1, r):
+        super().__init__(daemon=True)
+        self.batch_v1 = batch_v1
+        self.r = r
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, pr_number, job, status):
+        with self.lock:
+            # 어노테이션이 붙기 전에 같은 Job 이벤트가 또 오면 무시
+            if job.metadata.name in self.pending:
+                return
+            self.pending.add(job.metadata.name)
+        self.queue.put((pr_number, job, status))
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            time.sleep(FLUSH_INTERVAL)
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                self.flush(batch)
+            except Exception as e:
+                print(f"[ERROR] 완료 알림 처리 실패: {e}")
+            finally:
+                with self.lock:
+                    for _, job, _ in batch:
+                        self.pending.discard(job.metadata.name)
+
+    def flush(self, batch):
+        groups = {}
+        for item in batch:
+            groups.setdefault(lookup_experiment_id(item[1]), []).append(item)
+
+        for experiment_id, items in groups.items():
+            runs = {}
+            if experiment_id:
+                since_ms = min(job.metadata.creation_timestamp.timestamp() for _, job, _ in items) * 1000
+                try:
+                    runs = mlflow_lookup.find_runs(experiment_id, [job.metadata.name for _, job, _ in items], since_ms)
+                except Exception as e:
+                    print(f"[WARN] MLflow 검색 실패: {e}")
+
+            for pr_number, job, status in items:
+                name = job.metadata.name
+                run_id = comment_pr(pr_number, name, status, job, experiment_id, runs.get(name))
+                state = "succeeded" if status == "success" else "failed"
+                update_job_status(self.r, job, state, mlflow_run_id=run_id or "")
+                if status == "success":
+                    record_result(self.r, job, experiment_id, runs.get(name))
+                mark_job_annotation(self.batch_v1, job, f"{status}-commented")
 
-    for event in watcher.stream(batch_v1.list_namespaced_job, namespace=NAMESPACE):
-        job = event['object']
+class CacheHitNotifier(threading.Thread):
+    """train-worker가 결과 캐시로 처리한 요청을 PR에 알림 (Job이 만들어지지 않아 watch로는 알 수 없음)"""
+
+    def __init__(self, r):
+        super().__init__(daemon=True)
+        self.r = r
+
+    def run(self):
+        while True:
+            try:
+                item = self.r.blpop(f"{RESULT_CACHE_PREFIX}:hits", timeout=5)
+                if item is None:
+                    continue
+                hit = json.loads(item[1])
+                print(f"♻️ Job {hit['job_name']} 캐시 재사용 (run {hit['run_id']}) - PR #{hit['pr']}에 알림")
+                run = {"info": {"run_id": hit["run_id"], "artifact_uri": hit.get("artifact_uri")}}
+                # 같은 sha 재요청이면 Job 이름이 원래 Job과 같으므로 원래 코멘트를 덮어쓰지 않게 요청별 코멘트
+                comment_pr(int(hit["pr"]), hit["job_name"], "cached", hit, hit.get("experiment_id"), run,
+                           key=f"{hit['job_name']}-cached-{hit['job_id']}")
+            except Exception as e:
+                print(f"[ERROR] 캐시 알림 처리 실패: {e}")
+                time.sleep(3)
+
+class JobEventHandler:
+    """Job 이벤트 → 새 상태 전이일 때만 알림 / 상태 갱신 (이미 처리한 전이는 메모리 캐시로 거름)"""
+
+    def __init__(self, batch_v1, r, notifier):
+        self.batch_v1 = batch_v1
+        self.r = r
+        self.notifier = notifier
+        # Job 이름 → 이미 보낸 알림 ("started", "success", "failure")
+        self.notified = {}
+        # Job 이름 → 마지막으로 기록한 상태
+        self.states = {}
+
+    def __call__(self, event_type, job):
         name = job.metadata.name
-        status = job.status
+        if event_type == "DELETED":
+            self.notified.pop(name, None)
+            self.states.pop(name, None)
+            return
+
         labels = job.metadata.labels or {}
-        annos = job.metadata.annotations or {}
-        print(name)
         # PR 번호 확인
         pr_str = labels.get("pr-number")
-        if not pr_str:
-            continue
-            
         try:
             pr_number = int(pr_str)
-        except ValueError:
+        except (TypeError, ValueError):
             print(f"Job {name}: 잘못된 PR 번호 형식: {pr_str}")
-            continue
-        
-        print(f"Job {name} (PR #{pr_number}) 상태 확인...")
-        
+            return
+
+        status = job.status
+        if name not in self.notified:
+            # 재시작 후 처음 보는 Job은 어노테이션으로 이미 보낸 알림을 복원
+            annos = job.metadata.annotations or {}
+            self.notified[name] = {
+                key for key in ("started", "success", "failure")
+                if annos.get(f"{key}-commented") == "true"
+            }
+        notified = self.notified[name]
+
+        # Job 상태 인덱스 갱신 (완료 상태는 notifier에서 MLflow run id와 함께 기록)
+        state = job_state(status)
+        if state == "running" and self.states.get(name) != state:
+            update_job_status(self.r, job, state)
+        self.states[name] = state
+
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
         # 1. 시작 알림 (Job이 처음 관측되었을 때)
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        if annos.get("started-commented") != "true":
+        if "started" not in notified:
             print(f"🚀 Job {name} 시작됨 - PR #{pr_number}에 알림")
-            comment_pr(pr_number, name, "started", job)  # job 객체 전달
-            mark_job_annotation(batch_v1, job, "started-commented")
-            continue  # 시작 알림 후 이번 루프는 종료
-            
+            notified.add("started")
+            comment_pr(pr_number, name, "started", job, lookup_experiment_id(job))  # job 객체 전달
+            mark_job_annotation(self.batch_v1, job, "started-commented")
+
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
         # 2. 완료 상태 처리 (성공/실패)
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        print(status.succeeded and status.succeeded == 1)
-        if status.succeeded and status.succeeded == 1:
-            if annos.get("success-commented") != "true":
+        # Job의 Complete / Failed condition 기준 - 여러 Pod DDP(Indexed Job)는 모든 Pod가 성공해야 Complete,
+        # Pod 하나가 실패해도 backoffLimit 안에서 재시도(체크포인트에서 이어서 학습) 중이면 아직 실패가 아님
+        if state == "succeeded":
+            if "success" not in notified:
                 print(f"✅ Job {name} 성공 완료 - PR #{pr_number}에 알림")
-                comment_pr(pr_number, name, "success", job)  # job 객체 전달
-                mark_job_annotation(batch_v1, job, "success-commented")
-                
-        elif status.failed and status.failed > 0:
-            if annos.get("failure-commented") != "true":
+                notified.add("success")
+                self.notifier.submit(pr_number, job, "success")
+
+        elif state == "failed":
+            if "failure" not in notified:
                 print(f"❌ Job {name} 실패 - PR #{pr_number}에 알림")
-                comment_pr(pr_number, name, "failure", job)  # job 객체 전달
-                mark_job_annotation(batch_v1, job, "failure-commented")
+                notified.add("failure")
+                self.notifier.submit(pr_number, job, "failure")
+
+def main():
+    try:
+        config.load_incluster_config()
+        print("Loaded kube config from within the cluster.")
+    except Exception as e:
+        config.load_kube_config()
+        print("Loaded kube config from local machine.")    
+
+    batch_v1 = client.BatchV1Api()
+    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    github.start(r)
+    notifier = FinishedJobNotifier(batch_v1, r)
+    notifier.start()
+    CacheHitNotifier(r).start()
+    
+    print(f"👀 {NAMESPACE} 네임스페이스 Job 감시 시작...")
+
+    # pr-number 라벨이 있는 학습 Job만 list + watch
+    informer = JobInformer(batch_v1, NAMESPACE, "pr-number", JobEventHandler(batch_v1, r, notifier))
+    informer.run()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,62 @@
+# loadtest.py
+# train-api 부하 테스트 (fakeredis를 Redis 대신 사용, 서버 없이 ASGI로 직접 호출)
+#   pip install httpx fakeredis
+#   python loadtest.py --requests 2000 --concurrency 50
+
+import os
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+
+import httpx
+from fakeredis import FakeAsyncRedis
+from main import app, QUEUE_NAME
+
+JOB = {
+    "pr": 1,
+    "repo": "choiyounghwan123/x-ray",
+    "sha": "0123456789abcdef0123456789abcdef01234567",
+    "experiment_name": "Lung-Xray-Segmentation",
+    "name": "unet",
+    "params": {"epochs": 5, "batch_size": 4, "lr": 0.001},
+}
+
+
+async def run(path, body, total, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        async def one():
+            async with sem:
+                resp = await http.post(path, json=body)
+                resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(total)])
+        return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=20, help="Jobs per /train/batch request")
+    args = parser.parse_args()
+
+    app.state.redis = FakeAsyncRedis(decode_responses=True)
+
+    elapsed = await run("/train", JOB, args.requests, args.concurrency)
+    print(f"/train        {args.requests / elapsed:8.1f} req/s  ({args.requests} jobs in {elapsed:.2f}s)")
+
+    n = max(args.requests // args.batch, 1)
+    elapsed = await run("/train/batch", {"jobs": [JOB] * args.batch}, n, args.concurrency)
+    print(f"/train/batch  {n / elapsed:8.1f} req/s  ({n * args.batch / elapsed:.1f} jobs/s)")
+
+    print(f"queued: {await app.state.redis.llen(QUEUE_NAME)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,40 +1,245 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
 from dotenv import load_dotenv
-import redis
+import redis.asyncio as redis
 import os
 import json
+import time
 import uuid
+from schemas import TrainRequest, TrainBatchRequest, SweepRequest
+from sweep import TERMINAL_STATES, MlflowRest, expand_space, trial_name, is_better, run_summary
 
 # 환경변수 로드
 load_dotenv()
 
-app = FastAPI()
+QUEUE_NAME = "training_jobs"
+
+# Job 상태 인덱스 (worker / job-monitor가 상태 전이마다 갱신)
+#   job:<job_id>      hash  state, pr, sha, name, *_at 타임스탬프, k8s_job, mlflow_run_id ...
+#   jobs:pr:<pr>      zset  job_id → queued_at
+STATUS_TTL = 14 * 24 * 3600
+MLFLOW_URL = os.getenv("MLFLOW_URL", "http://mlflow-service:5000")
+# SweepRequest에만 있는 필드 (trial payload에는 넣지 않음)
+SWEEP_FIELDS = {"space", "method", "n_trials", "seed", "metric", "mode", "prune", "prune_warmup", "prune_min_trials"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Redis 연결 (요청마다 새로 붙지 않도록 커넥션 풀 공유)
+    pool = redis.ConnectionPool(
+        host=os.getenv("REDIS_HOST"),
+        port=int(os.getenv("REDIS_PORT")),
+        db=0,
+        decode_responses=True,
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    )
+    app.state.redis = redis.Redis(connection_pool=pool)
+    app.state.mlflow = MlflowRest(MLFLOW_URL)
+    yield
+    await app.state.mlflow.aclose()
+    await app.state.redis.aclose()
+    await pool.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def make_job(req: TrainRequest):
+    job = req.model_dump()
+    job["job_id"] = str(uuid.uuid4())[:8]
+    return job
+
+
+async def enqueue(jobs):
+    # 큐 등록 + 상태/PR 인덱스 기록을 한 번의 트랜잭션으로
+    now = time.time()
+    pipe = app.state.redis.pipeline()
+    pipe.rpush(QUEUE_NAME, *[json.dumps(job) for job in jobs])
+    for job in jobs:
+        key = f"job:{job['job_id']}"
+        pipe.hset(key, mapping={
+            "job_id": job["job_id"],
+            "pr": job["pr"],
+            "sha": job["sha"],
+            "name": job["name"],
+            "experiment_name": job["experiment_name"],
+            "state": "queued",
+            "queued_at": now,
+            "updated_at": now,
+            **({"sweep_id": job["sweep_id"]} if job.get("sweep_id") else {}),
+        })
+        pipe.expire(key, STATUS_TTL)
+        pipe.zadd(f"jobs:pr:{job['pr']}", {job["job_id"]: now})
+        pipe.expire(f"jobs:pr:{job['pr']}", STATUS_TTL)
+    await pipe.execute()
 
-# Redis 연결
-r = redis.Redis(
-    host=os.getenv("REDIS_HOST"),
-    port=int(os.getenv("REDIS_PORT")),
-    db=0
-)
 
 @app.post("/train")
-async def train_endpoint(request: Request):
-    payload = await request.json()
-    
-    job_id = str(uuid.uuid4())[:8]
-
-    job = {
-        "job_id": job_id,
-        "pr": payload.get("pr"),
-        "repo": payload.get("repo"),
-        "sha": payload.get("sha"),
-        "experiment_name": payload.get("experiment_name"),
-        "name": payload.get("name"),
-        "image": payload.get("image", "fdgdfgdgf123/train-img:latest"),
-        "command": payload.get("command", ["python", "train_unet_with_mlflow.py"]),
-        "params": payload.get("params", {"epochs": 3})
+async def train_endpoint(req: TrainRequest):
+    job = make_job(req)
+
+    await enqueue([job])
+
+    return {"status": "queued", "job_id": job["job_id"]}
+
+
+@app.post("/train/batch")
+async def train_batch_endpoint(req: TrainBatchRequest):
+    jobs = [make_job(j) for j in req.jobs]
+
+    # 여러 Job을 RPUSH 한 번으로 등록
+    await enqueue(jobs)
+
+    return {"status": "queued", "job_ids": [job["job_id"] for job in jobs]}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    status = await app.state.redis.hgetall(f"job:{job_id}")
+    if not status:
+        raise HTTPException(status_code=404, detail="job not found")
+    return status
+
+
+@app.get("/jobs")
+async def list_jobs(pr: int, limit: int = Query(20, ge=1, le=100)):
+    # 최신 Job부터
+    job_ids = await app.state.redis.zrevrange(f"jobs:pr:{pr}", 0, limit - 1)
+    pipe = app.state.redis.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.hgetall(f"job:{job_id}")
+    results = await pipe.execute()
+    # TTL로 만료된 상태 해시는 건너뜀
+    return {
+        "pr": pr,
+        "jobs": [status for status in results if status],
     }
 
-    r.rpush("training_jobs", json.dumps(job))
 
-    return {"status": "queued", "job_id": job_id}
+@app.post("/sweeps")
+async def create_sweep(req: SweepRequest):
+    try:
+        trials = expand_space(req.space, req.method, req.n_trials, req.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sweep_id = uuid.uuid4().hex[:6]
+
+    # 부모 run (MLflow가 안 되면 부모 없이 sweep_id 태그만으로 진행)
+    experiment_id = parent_run_id = ""
+    try:
+        experiment_id = await app.state.mlflow.experiment_id(req.experiment_name)
+        parent_run_id = await app.state.mlflow.create_parent_run(experiment_id, sweep_id, {
+            "sweep_id": sweep_id,
+            "pr": req.pr,
+            "sha": req.sha,
+            "method": req.method,
+            "metric": req.metric,
+            "sweep_space": json.dumps(req.model_dump(mode="json")["space"]),
+        })
+    except Exception as e:
+        print(f"[WARN] MLflow parent run 생성 실패 (sweep {sweep_id}): {e}")
+
+    base = req.model_dump(exclude=SWEEP_FIELDS)
+    prune = {"prune": True, "prune_warmup": req.prune_warmup, "prune_min_trials": req.prune_min_trials} if req.prune else {}
+    jobs = []
+    for i, params in enumerate(trials):
+        job = make_job(TrainRequest(**{**base, "name": trial_name(req.name, sweep_id, i),
+                                        "params": {**req.params, **params, **prune}}))
+        job["sweep_id"] = sweep_id
+        tags = {"sweep_id": sweep_id, "trial": str(i)}
+        if parent_run_id:
+            tags["mlflow.parentRunId"] = parent_run_id
+        job["mlflow_tags"] = tags
+        jobs.append(job)
+
+    now = time.time()
+    pipe = app.state.redis.pipeline()
+    pipe.hset(f"sweep:{sweep_id}", mapping={
+        "sweep_id": sweep_id,
+        "pr": req.pr,
+        "name": req.name,
+        "experiment_name": req.experiment_name,
+        "experiment_id": experiment_id,
+        "parent_run_id": parent_run_id,
+        "method": req.method,
+        "metric": req.metric,
+        "mode": req.mode,
+        "n_trials": len(jobs),
+        "created_at": now,
+    })
+    pipe.hset(f"sweep:{sweep_id}:trials", mapping={
+        job["job_id"]: json.dumps({"trial": i, "params": params}) for i, (job, params) in enumerate(zip(jobs, trials))
+    })
+    for key in (f"sweep:{sweep_id}", f"sweep:{sweep_id}:trials"):
+        pipe.expire(key, STATUS_TTL)
+    await pipe.execute()
+    await enqueue(jobs)
+
+    return {"status": "queued", "sweep_id": sweep_id, "parent_run_id": parent_run_id,
+            "job_ids": [job["job_id"] for job in jobs]}
+
+
+@app.get("/sweeps/{sweep_id}")
+async def get_sweep(sweep_id: str):
+    r = app.state.redis
+    sweep = await r.hgetall(f"sweep:{sweep_id}")
+    if not sweep:
+        raise HTTPException(status_code=404, detail="sweep not found")
+    trials = {job_id: json.loads(v) for job_id, v in (await r.hgetall(f"sweep:{sweep_id}:trials")).items()}
+    pipe = r.pipeline(transaction=False)
+    for job_id in trials:
+        pipe.hgetall(f"job:{job_id}")
+    statuses = dict(zip(trials, await pipe.execute()))
+
+    # trial 번호 → MLflow run (캐시로 끝난 trial은 기존 run을 직접 조회)
+    runs = {}
+    if sweep["experiment_id"]:
+        try:
+            for run in await app.state.mlflow.search_trials(sweep["experiment_id"], sweep_id):
+                tags = {t["key"]: t["value"] for t in run.get("data", {}).get("tags", [])}
+                if "trial" in tags:
+                    runs[int(tags["trial"])] = run_summary(run, sweep["metric"])
+            for job_id, status in statuses.items():
+                trial = trials[job_id]["trial"]
+                if trial not in runs and status.get("state") == "cached" and status.get("mlflow_run_id"):
+                    runs[trial] = run_summary(await app.state.mlflow.get_run(status["mlflow_run_id"]), sweep["metric"])
+        except Exception as e:
+            print(f"[WARN] MLflow 조회 실패 (sweep {sweep_id}): {e}")
+
+    results, best = [], None
+    for job_id, trial in sorted(trials.items(), key=lambda item: item[1]["trial"]):
+        state = statuses[job_id].get("state", "expired")
+        result = {"trial": trial["trial"], "job_id": job_id, "state": state, "params": trial["params"],
+                  **runs.get(trial["trial"], {})}
+        # pruned trial은 중간에 잘린 값이므로 best 후보에서 제외
+        if state in ("succeeded", "cached") and result.get("value") is not None and result.get("stop_reason") != "pruned" \
+                and is_better(result["value"], best and best["value"], sweep["mode"]):
+            best = result
+        results.append(result)
+
+    done = all(t["state"] in TERMINAL_STATES or t["state"] == "expired" for t in results)
+    # 모든 trial이 끝나면 한 번만 부모 run에 best 기록 후 종료
+    if done and not sweep.get("finished_at"):
+        if await r.hsetnx(f"sweep:{sweep_id}", "finished_at", time.time()):
+            if best:
+                await r.hset(f"sweep:{sweep_id}", mapping={
+                    "best_trial": best["trial"], "best_run_id": best["run_id"], "best_value": best["value"]})
+            # best가 없으면 (모든 trial 실패 등) 부모 run은 FAILED로 종료
+            if sweep["parent_run_id"]:
+                try:
+                    await app.state.mlflow.finish_parent(sweep["parent_run_id"], sweep["metric"], best)
+                except Exception as e:
+                    print(f"[WARN] 부모 run 종료 실패 (sweep {sweep_id}): {e}")
+        sweep = await r.hgetall(f"sweep:{sweep_id}")
+
+    counts = {}
+    for t in results:
+        counts[t["state"]] = counts.get(t["state"], 0) + 1
+    return {
+        **sweep,
+        "done": done,
+        "states": counts,
+        "pruned": sum(1 for t in results if t.get("stop_reason") == "pruned"),
+        "best": best,
+        "trials": results,
+    }
@@ -0,0 +1,72 @@
+from typing import Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field, model_validator
+
+# Job 이름(train-job-pr-<pr>-<sha8>-<name>)이 K8s 이름 규칙 / 63자 제한을 넘지 않도록
+NAME_PATTERN = r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$"
+
+
+class TrainRequest(BaseModel):
+    pr: int = Field(ge=1)
+    repo: Optional[str] = None
+    sha: str = Field(min_length=8, max_length=40, pattern=r"^[0-9a-f]+$")
+    experiment_name: str = Field(min_length=1)
+    name: str = Field(max_length=30, pattern=NAME_PATTERN)
+    image: str = "fdgdfgdgf123/train-img:latest"
+    command: List[str] = Field(default=["python", "train_unet_with_mlflow.py"], min_length=1)
+    params: Dict[str, Union[bool, int, float, str]] = {"epochs": 3}
+    priority: int = 0
+    # 결과 캐시 key에 쓰임 (digest가 같으면 sha가 달라도 같은 이미지로 취급)
+    image_digest: Optional[str] = Field(default=None, pattern=r"^([^@\s]+@)?sha256:[0-9a-f]{64}$")
+    dataset_version: Optional[str] = None
+    # train-worker templates/<template>.yaml (없으면 <name>.yaml → default.yaml)
+    template: Optional[str] = Field(default=None, max_length=63, pattern=NAME_PATTERN)
+    # Pod당 GPU 수 (없으면 템플릿 값) / Pod 수 - 합쳐서 2 이상이면 torchrun DDP (--distributed=true)
+    gpus: Optional[int] = Field(default=None, ge=1, le=8)
+    nodes: int = Field(default=1, ge=1, le=8)
+    # true면 같은 설정으로 성공한 run이 있어도 다시 학습
+    force: bool = False
+
+
+class TrainBatchRequest(BaseModel):
+    jobs: List[TrainRequest] = Field(min_length=1, max_length=100)
+
+
+class SearchRange(BaseModel):
+    """random search 연속 구간 (grid에선 쓸 수 없음)"""
+    low: float
+    high: float
+    log: bool = False
+    type: Literal["float", "int"] = "float"
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.low > self.high or (self.log and self.low <= 0):
+            raise ValueError("expected low <= high (and low > 0 for log)")
+        return self
+
+
+class SweepRequest(TrainRequest):
+    # trial 이름이 <name>-<sweep_id 6자>-<trial 3자리>가 되므로 TrainRequest.name 제한(30자)에 맞춤
+    name: str = Field(max_length=19, pattern=NAME_PATTERN)
+    # params는 모든 trial에 공통, space는 trial마다 바뀌는 값 (값 목록 또는 구간)
+    space: Dict[str, Union[List[Union[bool, int, float, str]], SearchRange]] = Field(min_length=1)
+    method: Literal["grid", "random"] = "grid"
+    # random: trial 수 / grid: 조합이 이보다 많으면 거절
+    n_trials: int = Field(default=10, ge=1, le=100)
+    seed: Optional[int] = None
+    # 요약에서 best trial을 고를 MLflow metric
+    metric: str = "best_val_dice"
+    mode: Literal["min", "max"] = "max"
+    # 같은 epoch의 다른 trial 중앙값보다 나쁜 trial을 중단 (train/sweep.py MedianPruner)
+    prune: bool = False
+    prune_warmup: int = Field(default=1, ge=1)
+    prune_min_trials: int = Field(default=3, ge=1)
+
+    @model_validator(mode="after")
+    def check_space(self):
+        for key, values in self.space.items():
+            if isinstance(values, list) and not values:
+                raise ValueError(f"space.{key}: empty value list")
+            if self.method == "grid" and isinstance(values, SearchRange):
+                raise ValueError(f"space.{key}: grid search needs a value list")
+        return self
@@ -0,0 +1,123 @@
+# sweep.py
+# 하이퍼파라미터 sweep → trial Job 여러 개로 펼쳐서 training_jobs 큐에 등록
+#
+#   sweep:<sweep_id>          hash  pr, name, experiment_name, metric, mode, parent_run_id, n_trials, created_at,
+#                                   (모든 trial이 끝나면) finished_at, best_trial, best_run_id, best_value
+#   sweep:<sweep_id>:trials   hash  job_id → {"trial": i, "params": {...}}
+#
+# trial마다 name이 달라서 worker 스케줄러에서 각각 slot을 가짐 → 빈 GPU 슬롯만큼 동시에 실행
+# 부모 MLflow run(sweep-<sweep_id>) 아래에 trial run이 mlflow.parentRunId 태그로 묶임
+
+import math
+import time
+import random
+import itertools
+import httpx
+
+TERMINAL_STATES = {"succeeded", "failed", "superseded", "cached"}
+
+
+def expand_space(space, method, n_trials, seed=None):
+    """search space → trial별 params 목록"""
+    keys = sorted(space)
+    if method == "grid":
+        combos = list(itertools.product(*(space[k] for k in keys)))
+        if len(combos) > n_trials:
+            raise ValueError(f"grid has {len(combos)} combinations (n_trials={n_trials})")
+        return [dict(zip(keys, values)) for values in combos]
+
+    rng = random.Random(seed)
+    return [{k: sample(space[k], rng) for k in keys} for _ in range(n_trials)]
+
+
+def sample(dim, rng):
+    if isinstance(dim, list):
+        return rng.choice(dim)
+    if dim.log:
+        value = math.exp(rng.uniform(math.log(dim.low), math.log(dim.high)))
+    else:
+        value = rng.uniform(dim.low, dim.high)
+    if dim.type == "int":
+        return int(round(value))
+    # CLI 인자 / MLflow param으로 보기 좋게
+    return float(f"{value:.6g}")
+
+
+def trial_name(name, sweep_id, trial):
+    return f"{name}-{sweep_id}-{trial:03d}"
+
+
+def is_better(value, best, mode):
+    return best is None or (value > best if mode == "max" else value < best)
+
+
+class MlflowRest:
+    """train-api는 mlflow 패키지 없이 REST API로 부모 run 생성 / trial 조회"""
+
+    def __init__(self, base_url, timeout=10):
+        self.http = httpx.AsyncClient(base_url=f"{base_url}/api/2.0/mlflow", timeout=timeout)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def call(self, method, path, **kwargs):
+        resp = await self.http.request(method, path, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def experiment_id(self, name):
+        resp = await self.http.get("/experiments/get-by-name", params={"experiment_name": name})
+        if resp.status_code == 404:
+            # 학습 스크립트의 mlflow.set_experiment와 같이 없으면 생성
+            return (await self.call("POST", "/experiments/create", json={"name": name}))["experiment_id"]
+        resp.raise_for_status()
+        return resp.json()["experiment"]["experiment_id"]
+
+    async def create_parent_run(self, experiment_id, sweep_id, tags):
+        body = {
+            "experiment_id": experiment_id,
+            "run_name": f"sweep-{sweep_id}",
+            "start_time": int(time.time() * 1000),
+            "tags": [{"key": k, "value": str(v)} for k, v in tags.items()],
+        }
+        return (await self.call("POST", "/runs/create", json=body))["run"]["info"]["run_id"]
+
+    async def search_trials(self, experiment_id, sweep_id):
+        body = {
+            "experiment_ids": [experiment_id],
+            # 부모 run도 sweep_id 태그가 있으므로 trial 태그로 구분 (호출하는 쪽에서)
+            "filter": f"tags.sweep_id = '{sweep_id}'",
+            "max_results": 1000,
+        }
+        return (await self.call("POST", "/runs/search", json=body)).get("runs", [])
+
+    async def get_run(self, run_id):
+        return (await self.call("GET", "/runs/get", params={"run_id": run_id}))["run"]
+
+    async def finish_parent(self, run_id, metric, best):
+        """best trial을 부모 run에 기록하고 종료 (성공한 trial이 없으면 FAILED)"""
+        now = int(time.time() * 1000)
+        if best is None:
+            await self.call("POST", "/runs/update", json={"run_id": run_id, "status": "FAILED", "end_time": now})
+            return
+        batch = {"run_id": run_id, "tags": [
+            {"key": "best_trial", "value": str(best["trial"])},
+            {"key": "best_run_id", "value": best["run_id"]},
+        ]}
+        if best.get("value") is not None:
+            # 부모 run에는 best trial의 값을 같은 이름으로 기록 (UI에서 sweep끼리 비교)
+            batch["metrics"] = [{"key": metric, "value": best["value"], "timestamp": now, "step": 0}]
+        await self.call("POST", "/runs/log-batch", json=batch)
+        await self.call("POST", "/runs/update", json={"run_id": run_id, "status": "FINISHED", "end_time": now})
+
+
+def run_summary(run, metric):
+    data = run.get("data", {})
+    metrics = {m["key"]: m["value"] for m in data.get("metrics", [])}
+    tags = {t["key"]: t["value"] for t in data.get("tags", [])}
+    return {
+        "run_id": run["info"]["run_id"],
+        "run_status": run["info"].get("status"),
+        "value": metrics.get(metric),
+        "stop_reason": tags.get("stop_reason"),
+    }
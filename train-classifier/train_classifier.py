@@ -1,13 +1,22 @@
 import os
-import torch
+from contextlib import nullcontext
 import torch.nn as nn
 import torch.optim as optim
 from torchvision import datasets, transforms, models
-from torch.utils.data import DataLoader
 import mlflow
 import mlflow.pytorch  # ✅ NEW
 from dotenv import load_dotenv
 import argparse
+from loader import add_loader_args, make_loader
+from precision import add_precision_args, Precision
+from checkpoint import add_checkpoint_args, find_resumable_run, Checkpointer, BEST_FILE
+from early_stop import add_early_stop_args, EarlyStopping
+from sweep import add_sweep_args, run_tags, MedianPruner
+from trainer import add_trainer_args, Trainer
+from metrics import Accuracy
+from shards import ShardDataset, DecodeLabel
+from distributed import add_distributed_args, Distributed
+from augment import add_augment_args, Normalize, PairedAugment
 
 load_dotenv()
 job_name = os.getenv("name")
@@ -17,6 +26,15 @@ parser.add_argument("--data_dir", type=str, default="Chest-X-Ray", help="Data di
 parser.add_argument("--batch_size", type=int, default=64, help="Batch size")
 parser.add_argument("--lr", type=float, default=0.001, help="Learning rate")
 parser.add_argument("--num_epochs", type=int, default=5, help="Number of epochs")
+parser.add_argument("--shard_dir", type=str, default=None, help="Read train/val/test from tar shards (shards.py)")
+add_loader_args(parser)
+add_precision_args(parser)
+add_checkpoint_args(parser)
+add_early_stop_args(parser)
+add_sweep_args(parser)
+add_trainer_args(parser)
+add_distributed_args(parser)
+add_augment_args(parser)
 args = parser.parse_args()
 
 # 하이퍼파라미터
@@ -24,90 +42,119 @@ BATCH_SIZE = args.batch_size
 EPOCHS = args.num_epochs
 LR = args.lr
 DATA_DIR = "/data/chest_xray"
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# --distributed면 rank별 GPU, 샤드 / DistributedSampler도 rank 기준으로 나뉨
+dist = Distributed(args)
+DEVICE = dist.device
 
-# ✅ MLflow 설정
+# ✅ MLflow 설정 (experiment / run 생성과 기록은 rank 0만, 나머지 rank는 id만 받음)
 mlflow.set_tracking_uri("http://mlflow-service:5000")
-mlflow.set_experiment("Lung-Xray-Classifier")
+experiment_id = dist.broadcast(
+    mlflow.set_experiment(os.getenv("experiment_name", "Lung-Xray-Classifier")).experiment_id if dist.is_main else None)
 
-# 이미지 전처리
+# 이미지 전처리 (워커는 리사이즈 + 1채널 uint8까지만, 3채널 확장 / ImageNet 정규화는 디바이스에서 - augment.Normalize)
 transform = transforms.Compose([
     transforms.Resize((224, 224)),
-    transforms.Grayscale(num_output_channels=3),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225])
+    transforms.Grayscale(num_output_channels=1),
+    transforms.PILToTensor()
 ])
 
 # 데이터셋
-train_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "train"), transform=transform)
-val_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "val"), transform=transform)
-test_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "test"), transform=transform)
-
-train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
-val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE)
-test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE)
+if args.shard_dir:
+    train_dataset = ShardDataset(args.shard_dir, "train", DecodeLabel(transform))
+    val_dataset = ShardDataset(args.shard_dir, "val", DecodeLabel(transform), shuffle=False)
+    test_dataset = ShardDataset(args.shard_dir, "test", DecodeLabel(transform), shuffle=False)
+else:
+    train_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "train"), transform=transform)
+    val_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "val"), transform=transform)
+    test_dataset = datasets.ImageFolder(root=os.path.join(DATA_DIR, "test"), transform=transform)
+
+train_loader = make_loader(train_dataset, args, DEVICE, shuffle=True, sampler=dist.sampler(train_dataset, shuffle=True))
+val_loader = make_loader(val_dataset, args, DEVICE, sampler=dist.sampler(val_dataset))
+test_loader = make_loader(test_dataset, args, DEVICE, sampler=dist.sampler(test_dataset))
 
 num_classes = len(train_dataset.classes)
-print("Classes:", train_dataset.classes)
+if dist.is_main:
+    print("Classes:", train_dataset.classes)
 
 model = models.resnet18(pretrained=True)
 model.fc = nn.Linear(model.fc.in_features, num_classes)
-model = model.to(DEVICE)
+precision = Precision(args, DEVICE)
+model = precision.prepare_model(model.to(DEVICE))
 
 criterion = nn.CrossEntropyLoss()
 optimizer = optim.Adam(model.parameters(), lr=LR)
+trainer = Trainer(dist.wrap(model), optimizer, criterion, precision, DEVICE, prepare=Normalize(DEVICE),
+                  log_every=args.log_every, dist=dist, augment=PairedAugment(args, masks=False) if args.augment else None)
+
+# Job 재시도(backoff_limit)로 다시 시작된 경우 같은 run에 이어서 기록
+resume_run_id = dist.broadcast(find_resumable_run(experiment_id, job_name) if dist.is_main else None)
+checkpointer = Checkpointer(args, job_name, main=dist.is_main)
+# 검증 accuracy 기준
+stopper = EarlyStopping(args, mode="max", pruner=MedianPruner(args, experiment_id, "val_accuracy"), dist=dist)
 
 # ✅ MLflow 실험 시작
-with mlflow.start_run() as run:
-    mlflow.set_tag("job_name", job_name)
-    # 파라미터 로깅
-    mlflow.log_param("batch_size", BATCH_SIZE)
-    mlflow.log_param("epochs", EPOCHS)
-    mlflow.log_param("lr", LR)
-    mlflow.log_param("model", "resnet18")
-    mlflow.log_param("dataset", "chest_xray")
+with mlflow.start_run(run_id=resume_run_id) if dist.is_main else nullcontext() as run:
+    run_id = run.info.run_id if run else resume_run_id
+    start_epoch = 0
+    state = checkpointer.load(run_id, map_location=DEVICE) if resume_run_id else None
+    if state:
+        trainer.load_state_dict(state)
+        if "early_stop" in state:
+            stopper.load_state_dict(state["early_stop"])
+        start_epoch = state["epoch"] + 1
+        if dist.is_main:
+            print(f"Resuming run {run_id} from epoch {start_epoch + 1}")
+            mlflow.set_tag("resumed_from_epoch", start_epoch)
+    elif dist.is_main:
+        mlflow.set_tag("job_name", job_name)
+        # sweep trial이면 sweep_id / trial 번호 / 부모 run
+        mlflow.set_tags(run_tags())
+        # 파라미터 로깅
+        mlflow.log_param("batch_size", BATCH_SIZE)
+        mlflow.log_param("epochs", EPOCHS)
+        mlflow.log_param("lr", LR)
+        mlflow.log_param("model", "resnet18")
+        mlflow.log_param("dataset", "chest_xray")
+        mlflow.log_param("num_workers", args.num_workers)
+        mlflow.log_param("precision", precision.name)
+        mlflow.log_param("channels_last", args.channels_last)
+        mlflow.log_param("patience", args.patience)
+        mlflow.log_param("max_minutes", args.max_minutes)
+        mlflow.log_param("world_size", dist.world_size)
+        mlflow.log_param("augment", args.augment)
+        if args.augment:
+            mlflow.log_params(trainer.augment.params)
 
     # 학습
-    for epoch in range(EPOCHS):
-        model.train()
-        total_loss = 0
-
-        for x, y in train_loader:
-            x, y = x.to(DEVICE), y.to(DEVICE)
-            outputs = model(x)
-            loss = criterion(outputs, y)
-
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
-
-            total_loss += loss.item()
-
-        avg_loss = total_loss / len(train_loader)
-        print(f"Epoch [{epoch+1}/{EPOCHS}] Loss: {avg_loss:.4f}")
-        mlflow.log_metric("train_loss", avg_loss, step=epoch)
-
-    # 검증 함수
-    def evaluate(model, loader, name="val"):
-        model.eval()
-        correct = 0
-        total = 0
-        with torch.no_grad():
-            for x, y in loader:
-                x, y = x.to(DEVICE), y.to(DEVICE)
-                outputs = model(x)
-                _, predicted = torch.max(outputs, 1)
-                total += y.size(0)
-                correct += (predicted == y).sum().item()
-        acc = 100 * correct / total
-        mlflow.log_metric(f"{name}_accuracy", acc)
-        print(f"{name.capitalize()} Accuracy: {acc:.2f}%")
-        return acc
-
-    evaluate(model, val_loader, "val")
-    evaluate(model, test_loader, "test")
+    for epoch in range(start_epoch, EPOCHS):
+        # 이미 early stop으로 끝난 run을 재시도한 경우
+        if stopper.reason:
+            break
+
+        trainer.train_epoch(train_loader, epoch)
+        results = trainer.evaluate(val_loader, epoch, Accuracy(DEVICE))
+        if stopper.update(results["accuracy"], epoch, model) and checkpointer.enabled:
+            checkpointer.save({"model": stopper.best_state, "epoch": epoch}, BEST_FILE)
+
+        stop_reason = stopper.check(epoch)
+        if checkpointer.should_save(epoch) or (stop_reason and checkpointer.enabled):
+            checkpointer.save({**trainer.state_dict(), "epoch": epoch, "early_stop": stopper.state_dict()})
+        if stop_reason:
+            break
+
+    # 테스트 평가는 모든 rank가 같이 하므로 best weights도 모든 rank에 복원
+    restored = stopper.restore_best(model, checkpointer, run_id)
+    if dist.is_main:
+        mlflow.set_tag("stop_reason", stopper.reason or "completed")
+        if restored:
+            mlflow.log_metrics({"best_epoch": stopper.best_epoch + 1, "best_val_accuracy": stopper.best})
+
+    # 검증 정확도가 가장 좋았던 weights로 테스트
+    trainer.evaluate(test_loader, stopper.best_epoch or 0, Accuracy(DEVICE), prefix="test")
 
     # 모델 artifact 저장
-    mlflow.pytorch.log_model(model, artifact_path="model")
-    print(f"✅ 모델 저장 완료: Run ID = {run.info.run_id}")
+    if dist.is_main:
+        mlflow.pytorch.log_model(model, artifact_path="model")
+        print(f"✅ 모델 저장 완료: Run ID = {run_id}")
+
+dist.close()
@@ -0,0 +1,121 @@
+# job_queue.py
+# training_jobs 큐를 BLMOVE 기반 reliable queue로 사용
+#
+#   training_jobs                       대기 큐 (train-api가 RPUSH)
+#   training_jobs:processing:<worker>   워커가 꺼내서 제출 중인 Job (ack 전까지 유지)
+#   training_jobs:inflight              processing 항목의 visibility 만료 시각 (ZSET)
+#   training_jobs:delayed               재시도 대기 (ZSET, score = 다시 큐에 넣을 시각)
+#   training_jobs:dead                  재시도 한도 초과 / 복구 불가능한 Job
+
+import json
+import time
+import redis
+
+
+class ReliableQueue:
+    def __init__(self, r, worker_id, queue="training_jobs", visibility_timeout=300,
+                 max_attempts=5, backoff_base=5, backoff_max=600):
+        self.r = r
+        self.queue = queue
+        self.processing = f"{queue}:processing:{worker_id}"
+        self.inflight = f"{queue}:inflight"
+        self.delayed = f"{queue}:delayed"
+        self.dead = f"{queue}:dead"
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def fetch(self, max_jobs, timeout=5):
+        """대기 큐 → processing 리스트로 원자적으로 이동 (최대 max_jobs개) → (items, 남은 큐 길이)"""
+        first = self.r.blmove(self.queue, self.processing, timeout, "LEFT", "RIGHT")
+        if first is None:
+            return [], 0
+
+        pipe = self.r.pipeline(transaction=False)
+        for _ in range(max_jobs - 1):
+            pipe.lmove(self.queue, self.processing, "LEFT", "RIGHT")
+        pipe.llen(self.queue)
+        results = pipe.execute()
+        items = [first] + [data for data in results[:-1] if data is not None]
+
+        deadline = time.time() + self.visibility_timeout
+        self.r.zadd(self.inflight, {data: deadline for data in items})
+        return items, results[-1]
+
+    def ack(self, data):
+        pipe = self.r.pipeline()
+        pipe.lrem(self.processing, 1, data)
+        pipe.zrem(self.inflight, data)
+        pipe.execute()
+
+    def retry(self, data, error, retryable=True):
+        """실패한 Job을 지수 백오프로 재시도 예약, 한도를 넘으면 dead-letter로 이동 → 재시도 예약 여부"""
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            payload, retryable = None, False
+
+        pipe = self.r.pipeline()
+        pipe.lrem(self.processing, 1, data)
+        pipe.zrem(self.inflight, data)
+
+        attempts = (payload or {}).get("attempts", 0) + 1
+        if retryable and attempts < self.max_attempts:
+            payload["attempts"] = attempts
+            delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+            pipe.zadd(self.delayed, {json.dumps(payload): time.time() + delay})
+            print(f"[WARN] Retry {attempts}/{self.max_attempts - 1} in {delay}s: {error}")
+            pipe.execute()
+            return True
+        else:
+            pipe.rpush(self.dead, json.dumps({
+                "data": data,
+                "error": str(error),
+                "attempts": attempts,
+                "failed_at": time.time(),
+            }))
+            print(f"[ERROR] Moved to {self.dead}: {error}")
+            pipe.execute()
+            return False
+
+    def promote_delayed(self):
+        """재시도 시각이 된 Job을 대기 큐로 되돌림"""
+        moved = 0
+        for data in self.r.zrangebyscore(self.delayed, 0, time.time()):
+            # ZREM 성공한 워커만 큐에 넣어서 중복 방지
+            if self.r.zrem(self.delayed, data):
+                self.r.rpush(self.queue, data)
+                moved += 1
+        return moved
+
+    def requeue_expired(self):
+        """visibility timeout이 지난 processing 항목(죽은 워커 포함)을 대기 큐로 되돌림"""
+        now = time.time()
+        requeued = 0
+        for key in self.r.scan_iter(f"{self.queue}:processing:*"):
+            for data in self.r.lrange(key, 0, -1):
+                deadline = self.r.zscore(self.inflight, data)
+                if deadline is None:
+                    # BLMOVE 직후 ZADD 전에 죽은 경우 → 지금부터 타임아웃 시작
+                    self.r.zadd(self.inflight, {data: now + self.visibility_timeout}, nx=True)
+                    continue
+                if deadline > now:
+                    continue
+                with self.r.pipeline() as pipe:
+                    try:
+                        pipe.watch(key)
+                        if data not in pipe.lrange(key, 0, -1):
+                            pipe.unwatch()
+                            continue
+                        pipe.multi()
+                        pipe.lrem(key, 1, data)
+                        pipe.zrem(self.inflight, data)
+                        pipe.rpush(self.queue, data)
+                        pipe.execute()
+                        requeued += 1
+                    except redis.WatchError:
+                        continue
+        return requeued
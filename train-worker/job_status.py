@@ -0,0 +1,20 @@
+# job_status.py
+# job:<job_id> 상태 해시 갱신 (train-api가 queued로 만들고 worker / job-monitor가 이어서 갱신)
+#   state: queued → submitted → running → succeeded | failed  (+ superseded, cached = 기존 run 재사용)
+
+import time
+
+STATUS_TTL = 14 * 24 * 3600
+
+
+def set_job_state(r, job_id, state, **fields):
+    if not job_id:
+        return
+    key = f"job:{job_id}"
+    now = time.time()
+    pipe = r.pipeline()
+    pipe.hset(key, mapping={"state": state, "updated_at": now, **fields})
+    # 각 상태에 처음 들어간 시각만 기록
+    pipe.hsetnx(key, f"{state}_at", now)
+    pipe.expire(key, STATUS_TTL)
+    pipe.execute()
@@ -0,0 +1,145 @@
+# job_template.py
+# templates/<name>.yaml (Job 매니페스트) → 처음 쓸 때 한 번만 읽어서 캐시, Job마다 복사 후 job별 값만 채움
+#
+#   선택 순서: payload["template"] → templates/<payload["name"]>.yaml (있으면) → templates/default.yaml
+#   job별로 채우는 값: metadata.name / namespace / labels, trainer 컨테이너의 image / command / args(앞쪽) / env(뒤쪽)
+#   ConfigMap 등으로 templates 디렉터리를 바꿔 끼우면 코드 수정 없이 GPU 수 / PVC / 노드 / 제한 시간 변경 가능
+#
+# DDP (payload["gpus"] / payload["nodes"], 또는 GPU 여러 장짜리 템플릿):
+#   Pod당 프로세스 = GPU 수 (CPU 템플릿은 1), 전체가 2개 이상이면 python → torchrun으로 바꿔서 실행
+#   nodes > 1이면 Indexed Job (Pod마다 hostname <job>-<index>) + headless Service(train-ddp-service.yaml)로
+#   <job>-0.<DDP_SERVICE>에서 c10d rendezvous
+
+import os
+import copy
+import threading
+import yaml
+
+TEMPLATE_DIR = os.getenv("JOB_TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+DEFAULT_TEMPLATE = "default"
+CONTAINER_NAME = "trainer"
+DDP_SERVICE = os.getenv("DDP_SERVICE", "train-ddp")
+DDP_PORT = int(os.getenv("DDP_PORT", 29500))
+
+
+def trainer_container(manifest):
+    containers = manifest["spec"]["template"]["spec"]["containers"]
+    for container in containers:
+        if container.get("name") == CONTAINER_NAME:
+            return container
+    return containers[0]
+
+
+def gpu_count(manifest):
+    limits = trainer_container(manifest).get("resources", {}).get("limits", {})
+    return int(limits.get("nvidia.com/gpu", 0))
+
+
+def is_gpu_device(volume_name):
+    # nvidia0, nvidia1, ... (nvidiactl / nvidia-uvm 등은 GPU 수와 무관)
+    return volume_name.startswith("nvidia") and volume_name[6:].isdigit()
+
+
+def set_gpu_count(manifest, gpus):
+    """GPU limit 변경 + 템플릿이 /dev/nvidiaN을 hostPath로 마운트하면 장치 파일도 N장에 맞춤"""
+    container = trainer_container(manifest)
+    container.setdefault("resources", {}).setdefault("limits", {})["nvidia.com/gpu"] = str(gpus)
+
+    pod = manifest["spec"]["template"]["spec"]
+    devices = [f"nvidia{i}" for i in range(gpus)]
+    mounts = container.get("volumeMounts", [])
+    if not any(m["name"] == "nvidia0" for m in mounts):
+        return
+    container["volumeMounts"] = [m for m in mounts if not is_gpu_device(m["name"])] + \
+        [{"name": d, "mountPath": f"/dev/{d}"} for d in devices]
+    pod["volumes"] = [v for v in pod.get("volumes", []) if not is_gpu_device(v["name"])] + \
+        [{"name": d, "hostPath": {"path": f"/dev/{d}"}} for d in devices]
+
+
+def distribute(manifest, job_name, nodes=1):
+    """Pod당 GPU 수 × nodes가 2 이상이면 torchrun 실행으로 바꿈 → world size (1이면 그대로)"""
+    nprocs = max(gpu_count(manifest), 1)
+    if nprocs * nodes == 1:
+        return 1
+
+    container = trainer_container(manifest)
+    command = container["command"]
+    if not command[0].startswith("python"):
+        raise ValueError(f"Distributed jobs need a python command (got {command[0]})")
+    launcher = ["torchrun", f"--nproc_per_node={nprocs}"]
+    if nodes == 1:
+        launcher.append("--standalone")
+    else:
+        # Pod 0이 rendezvous store, 나머지 Pod는 DNS가 생기는 대로 접속 (준비 안 된 Pod도 DNS에 등록 - publishNotReadyAddresses)
+        launcher += [f"--nnodes={nodes}", "--rdzv_backend=c10d", f"--rdzv_id={job_name}",
+                     f"--rdzv_endpoint={job_name}-0.{DDP_SERVICE}:{DDP_PORT}"]
+        spec = manifest["spec"]
+        spec["completionMode"] = "Indexed"
+        spec["completions"] = nodes
+        spec["parallelism"] = nodes
+        pod = spec["template"]
+        pod["metadata"].setdefault("labels", {})[DDP_SERVICE] = "true"
+        pod["spec"]["subdomain"] = DDP_SERVICE
+    # python -u 등 인터프리터 옵션은 torchrun에 없으므로 스크립트부터
+    script = command[1:]
+    while script and script[0].startswith("-"):
+        script = script[1:]
+    container["command"] = launcher + script
+    container["args"] = container.get("args", []) + ["--distributed=true"]
+    return nprocs * nodes
+
+
+class JobTemplates:
+    def __init__(self, template_dir=TEMPLATE_DIR, namespace="default"):
+        self.template_dir = template_dir
+        self.namespace = namespace
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def exists(self, name):
+        return name in self._cache or os.path.exists(os.path.join(self.template_dir, f"{name}.yaml"))
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = self._load(name)
+            return self._cache[name]
+
+    def _load(self, name):
+        path = os.path.join(self.template_dir, f"{name}.yaml")
+        if not os.path.exists(path):
+            # 재시도해도 생기지 않으므로 ValueError → dead-letter
+            raise ValueError(f"Unknown job template: {name}")
+        with open(path) as f:
+            manifest = yaml.safe_load(f)
+        if manifest.get("kind") != "Job" or not manifest.get("spec", {}).get("template", {}).get("spec", {}).get("containers"):
+            raise ValueError(f"Invalid job template {path}: expected a Job with at least one container")
+        manifest.setdefault("metadata", {}).setdefault("namespace", self.namespace)
+        print(f"[INFO] Loaded job template {name} (gpus={gpu_count(manifest)})")
+        return manifest
+
+    def select(self, payload):
+        if payload.get("template"):
+            return payload["template"]
+        if self.exists(payload["name"]):
+            return payload["name"]
+        return DEFAULT_TEMPLATE
+
+    def render(self, name, job_name, labels, image, command, args, env):
+        """캐시된 템플릿 복사 + job별 값 → create_namespaced_job에 바로 넘길 수 있는 dict"""
+        manifest = copy.deepcopy(self.get(name))
+        metadata = manifest["metadata"]
+        metadata["name"] = job_name
+        metadata["labels"] = {**metadata.get("labels", {}), **labels}
+
+        pod = manifest["spec"]["template"]
+        pod.setdefault("metadata", {})
+        pod["metadata"]["labels"] = {**pod["metadata"].get("labels", {}), **labels}
+
+        container = trainer_container(manifest)
+        container["image"] = image
+        container["command"] = command
+        # 템플릿 args(예: --data_dir=/data)를 뒤에 둬서 요청 params보다 우선
+        container["args"] = args + container.get("args", [])
+        container["env"] = container.get("env", []) + env
+        return manifest
@@ -0,0 +1,170 @@
+# result_cache.py
+# 같은 코드 / 명령 / 파라미터 / 데이터셋으로 이미 성공한 학습이 있으면 GPU Job 대신 기존 run을 재사용
+#
+#   result_cache:<key>     hash  run_id, experiment_id, artifact_uri, k8s_job, job_id, cached_at
+#                                (job-monitor가 Job 성공 시 기록 + MLflow run에 cache_key 태그)
+#   result_cache:hits      list  캐시로 끝난 요청 → job-monitor가 꺼내서 PR 코멘트
+#
+# key = sha256(image digest(없으면 image + git sha), command, 정규화된 params, dataset version, experiment,
+#              template, gpus, nodes)
+# Job 라벨 값(63자 제한)에 넣을 수 있도록 앞 40자만 사용
+
+import os
+import json
+import time
+import hashlib
+import requests
+
+CACHE_PREFIX = "result_cache"
+HITS_KEY = f"{CACHE_PREFIX}:hits"
+CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 30 * 24 * 3600))
+DATASET_VERSION = os.getenv("DATASET_VERSION", "training-data-pvc-v2")
+# job-monitor와 같은 기준 - pruned(sweep의 다른 trial에 따라 잘린 run)는 재사용하지 않음
+CACHEABLE_STOP_REASONS = {"completed", "patience", "time_budget"}
+
+# 결과(모델)에는 영향이 없는 성능 / 로깅용 인자 → key에서 제외
+# data_dir은 Job 템플릿 args(--data_dir=/data)가 항상 덮어씀
+IGNORED_PARAMS = {
+    "data_dir", "cache_dir", "shard_dir", "num_workers", "prefetch_factor", "pin_memory",
+    "persistent_workers", "checkpoint_every", "checkpoint_dir", "log_every",
+}
+
+
+def image_identity(payload):
+    """image digest가 있으면 digest만 (같은 이미지면 sha / 태그가 달라도 같은 key)"""
+    digest = payload.get("image_digest")
+    if digest:
+        return {"digest": digest.rsplit("@", 1)[-1]}
+    return {"image": payload["image"], "sha": payload["sha"]}
+
+
+def normalize_params(params, arg_mapping):
+    """스크립트 인자 이름 기준 / 문자열 값 (CLI로 넘어가는 --k=v와 같은 형태)"""
+    normalized = {}
+    for k, v in params.items():
+        name = arg_mapping.get(k, k)
+        if name in IGNORED_PARAMS:
+            continue
+        if isinstance(v, bool):
+            v = str(v).lower()
+        normalized[name] = str(v)
+    return dict(sorted(normalized.items()))
+
+
+def cache_key(payload, arg_mapping):
+    identity = {
+        **image_identity(payload),
+        "command": payload["command"],
+        "params": normalize_params(payload["params"], arg_mapping),
+        "dataset_version": payload.get("dataset_version") or DATASET_VERSION,
+    }
+    # 다른 experiment의 run을 재사용하면 PR / 대시보드가 엉뚱한 experiment를 가리킴
+    if payload.get("experiment_name"):
+        identity["experiment"] = payload["experiment_name"]
+    # 템플릿을 직접 고른 경우만 포함 (GPU 수 등이 달라지면 결과도 달라질 수 있음 / 기존 key는 그대로)
+    if payload.get("template"):
+        identity["template"] = payload["template"]
+    # DDP는 전체 배치(batch_size × world size)가 달라지므로 GPU / Pod 수를 지정한 경우만 포함
+    if payload.get("gpus"):
+        identity["gpus"] = payload["gpus"]
+    if (payload.get("nodes") or 1) > 1:
+        identity["nodes"] = payload["nodes"]
+    text = json.dumps(identity, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()[:40]
+
+
+class ResultCache:
+    """Redis 조회 → 없으면 MLflow에서 cache_key 태그가 붙은 FINISHED run 검색 (찾으면 Redis에 다시 채움)"""
+
+    def __init__(self, r, mlflow_url=None):
+        self.r = r
+        self.mlflow_url = mlflow_url
+        self.session = requests.Session()
+        self._experiments = {}
+
+    def get(self, key, experiment_name=None):
+        hit = self.r.hgetall(f"{CACHE_PREFIX}:{key}")
+        if hit and self._same_experiment(hit, experiment_name):
+            return hit
+        if not (self.mlflow_url and experiment_name):
+            return None
+        try:
+            hit = self._search_mlflow(key, experiment_name)
+        except Exception as e:
+            print(f"[WARN] MLflow cache lookup failed ({experiment_name}): {e}")
+            return None
+        if hit:
+            self.put(key, hit)
+        return hit
+
+    def put(self, key, record):
+        pipe = self.r.pipeline()
+        pipe.hset(f"{CACHE_PREFIX}:{key}", mapping={**record, "cached_at": time.time()})
+        pipe.expire(f"{CACHE_PREFIX}:{key}", CACHE_TTL)
+        pipe.execute()
+
+    def notify_hit(self, payload, job_name, key, hit):
+        event = {
+            "pr": payload["pr"],
+            "job_name": job_name,
+            "job_id": payload.get("job_id", ""),
+            "cache_key": key,
+            **hit,
+        }
+        self.r.rpush(HITS_KEY, json.dumps(event))
+
+    def _same_experiment(self, hit, experiment_name):
+        """Redis 항목이 요청한 experiment의 run인지 (확인할 수 없으면 그대로 사용)"""
+        if not (self.mlflow_url and experiment_name and hit.get("experiment_id")):
+            return True
+        try:
+            experiment_id = self._experiment_id(experiment_name)
+        except Exception as e:
+            print(f"[WARN] MLflow experiment lookup failed ({experiment_name}): {e}")
+            return True
+        if experiment_id == hit["experiment_id"]:
+            return True
+        print(f"[INFO] Cache entry {hit.get('run_id')} belongs to experiment {hit['experiment_id']}, "
+              f"not {experiment_name} ({experiment_id}) - ignored")
+        return False
+
+    def _experiment_id(self, name):
+        if name not in self._experiments:
+            resp = self.session.get(
+                f"{self.mlflow_url}/api/2.0/mlflow/experiments/get-by-name",
+                params={"experiment_name": name}, timeout=5
+            )
+            if resp.status_code == 404:
+                return None
+            resp.raise_for_status()
+            self._experiments[name] = resp.json()["experiment"]["experiment_id"]
+        return self._experiments[name]
+
+    def _search_mlflow(self, key, experiment_name):
+        experiment_id = self._experiment_id(experiment_name)
+        if experiment_id is None:
+            return None
+        resp = self.session.post(
+            f"{self.mlflow_url}/api/2.0/mlflow/runs/search",
+            json={
+                "experiment_ids": [experiment_id],
+                "filter": f"tags.cache_key = '{key}' and attributes.status = 'FINISHED' and tags.stop_reason != 'pruned'",
+                "order_by": ["attributes.start_time DESC"],
+                "max_results": 1,
+            },
+            timeout=5
+        )
+        resp.raise_for_status()
+        runs = resp.json().get("runs", [])
+        if not runs:
+            return None
+        info = runs[0]["info"]
+        tags = {t["key"]: t["value"] for t in runs[0].get("data", {}).get("tags", [])}
+        if tags.get("stop_reason") not in CACHEABLE_STOP_REASONS:
+            return None
+        return {
+            "run_id": info["run_id"],
+            "experiment_id": experiment_id,
+            "artifact_uri": info.get("artifact_uri", ""),
+            "k8s_job": tags.get("job_name", ""),
+        }
@@ -0,0 +1,147 @@
+# scheduler.py
+# PR / 실험 단위 fair-share 스케줄러
+#
+#   sched:pending   hash  slot("<pr>:<name>") → 대기 중인 payload (slot당 최신 sha 하나만 유지)
+#   sched:ready     zset  slot → 우선순위 score (작을수록 먼저, 처음 들어온 시각 기준)
+#   sched:latest    hash  slot → 마지막으로 받은 payload의 admitted_at (오래된 재시도 무시용)
+#
+# 한 PR에 커밋이 연달아 올라와도 slot마다 payload 하나만 남기 때문에
+# 다른 PR의 Job이 뒤로 밀리지 않음
+# sweep처럼 한 PR이 slot을 여러 개 가지면 take가 PR끼리 돌아가며 꺼냄:
+#   한 번에 PR당 하나씩, 꺼낸 PR의 남은 slot은 그 시점 기준으로 다시 줄을 섬 (그 전에 들어온 다른 PR 요청이 먼저)
+
+import json
+import time
+import redis
+
+# priority 1 = 대기열에서 1시간 먼저 들어온 것과 같은 취급
+PRIORITY_WEIGHT = 3600
+
+
+def slot_of(payload):
+    return f"{payload['pr']}:{payload['name']}"
+
+
+def pr_of(slot):
+    return slot.split(":", 1)[0]
+
+
+def round_robin(slots, n):
+    """score 순 slot 목록 → PR마다 하나씩 돌아가며 최대 n개"""
+    by_pr = {}
+    for slot in slots:
+        by_pr.setdefault(pr_of(slot), []).append(slot)
+    picked = []
+    while len(picked) < n and by_pr:
+        for pr in list(by_pr):
+            picked.append(by_pr[pr].pop(0))
+            if not by_pr[pr]:
+                del by_pr[pr]
+            if len(picked) == n:
+                break
+    return picked
+
+
+class FairScheduler:
+    def __init__(self, r, prefix="sched"):
+        self.r = r
+        self.pending = f"{prefix}:pending"
+        self.ready = f"{prefix}:ready"
+        self.latest = f"{prefix}:latest"
+
+    def admit(self, payload, finished=False):
+        """payload를 slot에 등록 → (accepted, 대체된 이전 payload)
+
+        finished=True면 (결과 캐시 hit처럼 Job 없이 끝난 요청) 등록 대신 slot을 비우고 latest만 기록
+        """
+        payload.setdefault("admitted_at", time.time())
+        slot = slot_of(payload)
+        score = payload["admitted_at"] - PRIORITY_WEIGHT * int(payload.get("priority", 0))
+
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.pending, self.latest)
+                    latest = pipe.hget(self.latest, slot)
+                    # 같은 slot에 더 새로운 요청이 이미 들어왔으면 (예: 예전 sha의 재시도) 버림
+                    if latest is not None and float(latest) > payload["admitted_at"]:
+                        pipe.unwatch()
+                        return False, None
+                    old = pipe.hget(self.pending, slot)
+
+                    pipe.multi()
+                    pipe.hset(self.latest, slot, payload["admitted_at"])
+                    if finished:
+                        pipe.hdel(self.pending, slot)
+                        pipe.zrem(self.ready, slot)
+                    else:
+                        pipe.hset(self.pending, slot, json.dumps(payload))
+                        # 대체되는 경우에도 기존 순서(score)는 유지
+                        pipe.zadd(self.ready, {slot: score}, nx=True)
+                    pipe.execute()
+                    return True, json.loads(old) if old else None
+                except redis.WatchError:
+                    continue
+
+    def take(self, n, queue, cost=None, budget=None):
+        """우선순위가 가장 높은 slot n개를 꺼내 queue의 processing 리스트로 옮김 → payload 문자열 목록
+
+        cost(payload) / budget이 있으면 cost 합이 budget 안에 드는 만큼만 (예: 필요한 GPU 수 / 남은 GPU 수)
+        순서대로 담다가 안 들어가는 요청이 나오면 그 뒤의 cost > 0 요청은 건너뜀 (작은 Job이 큰 Job을 계속 앞지르지 않도록)
+        """
+        if n <= 0:
+            return []
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.ready, self.pending)
+                    ready = dict(pipe.zrange(self.ready, 0, -1, withscores=True))
+                    if cost is None:
+                        slots = round_robin(list(ready), n)
+                        items = [data for data in pipe.hmget(self.pending, slots) if data] if slots else []
+                    else:
+                        slots, items = self._fit(pipe, round_robin(list(ready), len(ready)), n, cost, budget)
+                    if not slots:
+                        pipe.unwatch()
+                        return []
+
+                    # 이번에 꺼낸 PR의 남은 slot은 가장 앞선 slot이 지금 시각이 되도록 같이 뒤로 (PR 안의 순서 / priority 차이는 유지)
+                    taken = set(slots)
+                    requeue = {}
+                    for pr in {pr_of(slot) for slot in slots}:
+                        rest = {slot: score for slot, score in ready.items() if slot not in taken and pr_of(slot) == pr}
+                        shift = time.time() - min(rest.values(), default=0)
+                        if rest and shift > 0:
+                            requeue.update({slot: score + shift for slot, score in rest.items()})
+
+                    pipe.multi()
+                    pipe.zrem(self.ready, *slots)
+                    pipe.hdel(self.pending, *slots)
+                    if requeue:
+                        pipe.zadd(self.ready, requeue, xx=True)
+                    if items:
+                        pipe.rpush(queue.processing, *items)
+                        pipe.zadd(queue.inflight, {data: time.time() + queue.visibility_timeout for data in items})
+                    pipe.execute()
+                    return items
+                except redis.WatchError:
+                    continue
+
+    def _fit(self, pipe, order, n, cost, budget):
+        slots, items = [], []
+        blocked = False
+        for slot, data in zip(order, pipe.hmget(self.pending, order) if order else []):
+            if len(slots) == n:
+                break
+            need = cost(json.loads(data)) if data else 0
+            if need > budget or (need and blocked):
+                blocked = True
+                continue
+            budget -= need
+            slots.append(slot)
+            if data:
+                items.append(data)
+        return slots, items
+
+    def depth(self):
+        return self.r.zcard(self.ready)
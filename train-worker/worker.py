@@ -2,171 +2,372 @@ import os
 import redis
 import json
 import time
+import socket
+from concurrent.futures import ThreadPoolExecutor
 from kubernetes import client, config
-
-print("[INFO] Starting train-worker...")
+from kubernetes.client.rest import ApiException
+from job_queue import ReliableQueue
+from scheduler import FairScheduler
+from job_status import set_job_state
+from result_cache import ResultCache, cache_key
+from job_template import JobTemplates, gpu_count, set_gpu_count, distribute
 
 # Redis 설정
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+QUEUE_NAME = "training_jobs"
+METRICS_KEY = "train_worker:metrics"
+
+# 한 번에 꺼내서 제출할 최대 Job 수 / 동시 제출 스레드 수
+BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", 8))
+SUBMIT_CONCURRENCY = int(os.getenv("SUBMIT_CONCURRENCY", 4))
+NAMESPACE = os.getenv("NAMESPACE", "default")
+
+# reliable queue 설정 (ack 전 visibility timeout, 재시도 횟수/백오프)
+WORKER_ID = os.getenv("HOSTNAME", socket.gethostname())
+VISIBILITY_TIMEOUT = int(os.getenv("VISIBILITY_TIMEOUT", 300))
+MAX_ATTEMPTS = int(os.getenv("MAX_ATTEMPTS", 5))
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", 5))
+REAP_INTERVAL = 30
+
+# 동시에 쓸 수 있는 GPU 수 (실행 중인 Job의 GPU × Pod 수 합 기준, 예전 MAX_GPU_JOBS도 그대로 읽음),
+# 새 sha가 오면 같은 PR의 이전 Job 중단 여부
+MAX_GPUS = int(os.getenv("MAX_GPUS", os.getenv("MAX_GPU_JOBS", 1)))
+SUPERSEDE_RUNNING = os.getenv("SUPERSEDE_RUNNING", "true").lower() == "true"
+
+# 같은 image / command / params / dataset으로 성공한 run이 있으면 Job을 만들지 않고 재사용 (요청의 force=true면 무시)
+RESULT_CACHE = os.getenv("RESULT_CACHE", "true").lower() == "true"
+MLFLOW_URL = os.getenv("MLFLOW_URL", "http://mlflow-service:5000")
+
+# Job 스펙 템플릿 (처음 쓸 때 한 번만 읽고 캐시)
+TEMPLATES = JobTemplates(namespace=NAMESPACE)
+
+# 인자 이름 매핑 (스크립트의 정확한 인자명에 맞춤)
+ARG_MAPPING = {
+    "epochs": "num_epochs",
+    "batch_size": "batch_size",
+    "lr": "lr",
+    "data_dir": "data_dir",
+    "cache_dir": "cache_dir",
+    "shard_dir": "shard_dir",
+    "workers": "num_workers",
+    "num_workers": "num_workers",
+    "prefetch_factor": "prefetch_factor",
+    "pin_memory": "pin_memory",
+    "persistent_workers": "persistent_workers",
+    "amp": "amp",
+    "channels_last": "channels_last",
+    "checkpoint_every": "checkpoint_every",
+    "checkpoint_dir": "checkpoint_dir",
+    "log_every": "log_every",
+    "val_fraction": "val_fraction",
+    "stratify": "stratify",
+    "split_seed": "split_seed",
+    "patience": "patience",
+    "min_delta": "min_delta",
+    "max_minutes": "max_minutes",
+    "prune": "prune",
+    "prune_warmup": "prune_warmup",
+    "prune_min_trials": "prune_min_trials",
+    "augment": "augment",
+    "hflip": "hflip",
+    "rotate": "rotate",
+    "translate": "translate",
+    "scale": "scale",
+    "brightness": "brightness",
+    "contrast": "contrast",
+    "unet_base": "unet_base",
+    "unet_depth": "unet_depth",
+    "separable": "separable",
+    "batchnorm": "batchnorm",
+    "bilinear": "bilinear"
+}
+
+
+def job_name_of(payload):
+    # Kubernetes Job 이름
+    return f"train-job-pr-{payload['pr']}-{payload['sha'][:8]}-{payload['name']}"
+
+
+def build_job(payload):
+    """큐 payload → (Job 이름, Job 매니페스트 dict) - 템플릿(templates/*.yaml)에 job별 값만 채움"""
+    pr = payload["pr"]
+    sha = payload["sha"]
+    job_name = job_name_of(payload)
+    template = TEMPLATES.select(payload)
+
+    # 매핑된 인자들로 변환 (data_dir 등 템플릿 args가 뒤에 붙어서 우선)
+    mapped_args = []
+    for k, v in payload["params"].items():
+        arg_name = ARG_MAPPING.get(k, k)
+        mapped_args.append(f"--{arg_name}={v}")
+
+    labels = {"job": job_name, "pr-number": str(pr), "train-name": payload["name"], "sha": sha[:8],
+              "job-template": template}
+    if payload.get("job_id"):
+        labels["job-id"] = payload["job_id"]
+    # job-monitor가 성공 시 이 key로 결과를 캐시에 기록
+    labels["cache-key"] = cache_key(payload, ARG_MAPPING)
+
+    env = [
+        {"name": "name", "value": job_name},
+        {"name": "experiment_name", "value": payload["experiment_name"]},
+    ]
+    # sweep trial이면 run에 붙일 태그 (sweep_id, trial, mlflow.parentRunId)
+    if payload.get("mlflow_tags"):
+        env.append({"name": "MLFLOW_TAGS", "value": json.dumps(payload["mlflow_tags"])})
+    job = TEMPLATES.render(template, job_name, labels, payload["image"], payload["command"], mapped_args, env)
+
+    # 요청의 GPU 수가 템플릿과 다르면 덮어씀, Pod당 GPU × nodes가 2 이상이면 torchrun DDP
+    if payload.get("gpus"):
+        set_gpu_count(job, payload["gpus"])
+    world_size = distribute(job, job_name, payload.get("nodes") or 1)
+    job["metadata"]["labels"]["world-size"] = str(world_size)
+    return job_name, job
 
-print(f"[INFO] Connecting to Redis at {REDIS_HOST}:{REDIS_PORT}")
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
-try:
-    r.ping()
-    print("[INFO] Redis connection successful")
-except Exception as e:
-    print(f"[ERROR] Redis connection failed: {e}")
-    exit(1)
+def is_finished(job):
+    for condition in job.status.conditions or []:
+        if condition.type in ("Complete", "Failed") and condition.status == "True":
+            return True
+    return False
 
-# K8s 클러스터 접근 설정
-print("[INFO] Initializing Kubernetes client...")
-config.load_incluster_config()  # 쿠버네티스 클러스터 안에서 실행할 경우
 
-batch_v1 = client.BatchV1Api()
+def job_gpus(job):
+    """Pod 하나가 요청하는 GPU 수 (cpu-smoke처럼 GPU 없는 템플릿은 0)"""
+    total = 0
+    for container in job.spec.template.spec.containers or []:
+        limits = (container.resources and container.resources.limits) or {}
+        total += int(limits.get("nvidia.com/gpu", 0))
+    return total
 
-print("[INFO] Worker ready. Waiting for jobs...")
-while True:
+
+def count_active_gpus(batch_v1):
+    # Pod당 GPU × Pod 수(Indexed Job의 parallelism), GPU를 쓰지 않는 Job(CPU 스모크 테스트 등)은 0
+    jobs = batch_v1.list_namespaced_job(namespace=NAMESPACE, label_selector="pr-number")
+    return sum(job_gpus(job) * (job.spec.parallelism or 1) for job in jobs.items if not is_finished(job))
+
+
+def payload_gpus(payload):
+    """요청이 Job이 되면 쓸 GPU 수 (build_job과 같은 템플릿 / gpus / nodes 기준)"""
     try:
-        print("[INFO] Waiting for jobs in training_jobs queue...")
-        job_data = r.blpop("training_jobs", timeout=5)
-        if not job_data:
-            print("[DEBUG] No jobs in queue, waiting...")
+        gpus = payload.get("gpus") or gpu_count(TEMPLATES.get(TEMPLATES.select(payload)))
+    except ValueError:
+        # 잘못된 템플릿은 제출 단계에서 dead-letter로 보내도록 GPU 없이 통과
+        return 0
+    # 전체 GPU보다 큰 Job은 다른 Job이 모두 끝났을 때 혼자 실행
+    return min(gpus * (payload.get("nodes") or 1), MAX_GPUS)
+
+
+def cancel_stale_jobs(r, batch_v1, payload):
+    """같은 PR / 같은 학습의 이전 sha Job이 돌고 있으면 삭제해서 GPU를 비움"""
+    selector = f"pr-number={payload['pr']},train-name={payload['name']}"
+    for job in batch_v1.list_namespaced_job(namespace=NAMESPACE, label_selector=selector).items:
+        if job.metadata.labels.get("sha") == payload["sha"][:8] or is_finished(job):
+            continue
+        print(f"[INFO] Superseded running job: {job.metadata.name}")
+        batch_v1.delete_namespaced_job(name=job.metadata.name, namespace=NAMESPACE,
+                                       propagation_policy="Background")
+        set_job_state(r, job.metadata.labels.get("job-id"), "superseded", superseded_by=payload.get("job_id", ""))
+
+
+def find_cached_result(cache, payload):
+    """이미 성공한 같은 학습이 있으면 (cache key, 캐시 항목), 없으면 None"""
+    if cache is None or payload.get("force"):
+        return None
+    key = cache_key(payload, ARG_MAPPING)
+    hit = cache.get(key, payload.get("experiment_name"))
+    return (key, hit) if hit else None
+
+
+def reuse_cached_result(cache, payload, key, hit):
+    """Job 대신 기존 run 재사용 - 상태를 cached로 기록하고 PR 알림"""
+    job_name = job_name_of(payload)
+    print(f"[INFO] Cache hit: {job_name} → run {hit['run_id']} ({hit.get('k8s_job') or 'unknown job'})")
+    set_job_state(cache.r, payload.get("job_id"), "cached", cache_key=key, mlflow_run_id=hit["run_id"],
+                  cached_from=hit.get("k8s_job", ""))
+    cache.notify_hit(payload, job_name, key, hit)
+    cache.r.hincrby(METRICS_KEY, "total_cache_hits", 1)
+
+
+def admit_items(batch_v1, queue, scheduler, items, cache=None):
+    """대기 큐에서 꺼낸 Job을 스케줄러 slot에 등록하고 ack
+
+    캐시 hit면 slot에 등록하지 않지만, 같은 PR / 학습의 이전 sha(대기 중 / 실행 중)는 똑같이 대체
+    """
+    for data in items:
+        # K8s / Redis 일시 오류도 이 항목만 재시도로 보내고 나머지 항목은 계속 처리
+        try:
+            payload = json.loads(data)
+            cached = find_cached_result(cache, payload)
+            accepted, old = scheduler.admit(payload, finished=cached is not None)
+
+            if not accepted:
+                print(f"[INFO] Dropped stale job: PR #{payload['pr']} {payload['sha'][:8]} ({payload['name']})")
+                set_job_state(queue.r, payload.get("job_id"), "superseded")
+            elif old and old.get("job_id") != payload.get("job_id"):
+                # 같은 요청이 재시도로 다시 들어온 경우(old가 자기 자신)는 대체가 아님
+                print(f"[INFO] PR #{payload['pr']} {payload['name']}: {old['sha'][:8]} → {payload['sha'][:8]}")
+                set_job_state(queue.r, old.get("job_id"), "superseded", superseded_by=payload.get("job_id", ""))
+            if accepted and SUPERSEDE_RUNNING:
+                cancel_stale_jobs(queue.r, batch_v1, payload)
+            if accepted and cached:
+                reuse_cached_result(cache, payload, *cached)
+        except Exception as e:
+            queue.retry(data, e, retryable=is_retryable(e))
             continue
+        queue.ack(data)
 
-        _, data = job_data
-        print(f"[INFO] Received job: {data}")
+
+def resolve_conflict(batch_v1, payload, job_name, namespace):
+    """같은 이름의 Job이 이미 있을 때(409) - 이 요청이 이전 시도에서 만든 Job이면 성공, 아니면 예외
+
+    같은 sha를 다시 학습하는 요청(force 등)은 TTL 동안 남아 있는 이전 Job과 이름이 같음
+    → 끝난 Job(force면 실행 중이어도)을 지우고 재시도 큐로 보내서 다음 시도에 새로 만듦
+    """
+    existing = batch_v1.read_namespaced_job(name=job_name, namespace=namespace)
+    owner = (existing.metadata.labels or {}).get("job-id")
+    if owner == payload.get("job_id"):
+        return
+    if is_finished(existing) or payload.get("force"):
+        print(f"[INFO] Replacing existing job {job_name} (job {owner})")
+        batch_v1.delete_namespaced_job(name=job_name, namespace=namespace, propagation_policy="Background")
+        raise RuntimeError(f"Replaced existing job {job_name} (job {owner}), recreating on retry")
+    # 같은 sha가 이미 학습 중 - 그 Job의 결과가 PR에 올라가므로 이 요청은 재시도하지 않음
+    raise ValueError(f"{job_name} is already running for job {owner}")
+
+
+def submit_job(batch_v1, data):
+    """Job 하나 생성 → (data, job_name, 소요 시간, 에러)"""
+    start = time.perf_counter()
+    job_name = None
+    try:
         payload = json.loads(data)
+        job_name, job = build_job(payload)
+        namespace = job["metadata"]["namespace"]
+        try:
+            batch_v1.create_namespaced_job(namespace=namespace, body=job)
+        except ApiException as e:
+            if e.status != 409:
+                raise
+            resolve_conflict(batch_v1, payload, job_name, namespace)
+        return data, job_name, time.perf_counter() - start, None
+    except ApiException as e:
+        return data, job_name, time.perf_counter() - start, e
+    except Exception as e:
+        return data, job_name, time.perf_counter() - start, e
+
+
+def is_retryable(error):
+    # 잘못된 payload / 스펙(4xx)은 재시도해도 실패하므로 바로 dead-letter로 보냄
+    if isinstance(error, ApiException):
+        return error.status is None or error.status >= 500 or error.status == 429
+    return not isinstance(error, (ValueError, KeyError, TypeError))
+
+
+def job_id_of(data):
+    try:
+        return json.loads(data).get("job_id")
+    except Exception:
+        return None
+
+
+def handle_results(queue, results):
+    for data, job_name, _, error in results:
+        job_id = job_id_of(data)
+        if error:
+            print(f"[!] Error: {job_name}: {error}")
+            if not queue.retry(data, error, retryable=is_retryable(error)):
+                set_job_state(queue.r, job_id, "failed", error=str(error))
+        else:
+            print(f"[+] Created job: {job_name}")
+            queue.ack(data)
+            set_job_state(queue.r, job_id, "submitted", k8s_job=job_name)
+
 
-        pr = payload["pr"]
-        image = payload["image"]
-        params = payload["params"]
-        sha = payload["sha"]
-        # Kubernetes Job 이름
-        job_name = f"train-job-pr-{pr}-{sha[:8]}-{payload['name']}"
-
-        # 인자 이름 매핑 (스크립트의 정확한 인자명에 맞춤)
-        arg_mapping = {
-            "epochs": "num_epochs",
-            "batch_size": "batch_size", 
-            "lr": "lr",
-            "data_dir": "data_dir"
-        }
-        
-        # 매핑된 인자들로 변환
-        mapped_args = []
-        for k, v in params.items():
-            arg_name = arg_mapping.get(k, k)
-            mapped_args.append(f"--{arg_name}={v}")
-        
-        # data_dir 추가 (PVC 마운트 경로에 맞춤)
-        mapped_args.append("--data_dir=/data")
-
-        # Job 스펙
-        job = client.V1Job(
-            metadata=client.V1ObjectMeta(name=job_name, labels={"job": job_name, "pr-number": str(pr)}),
-            spec=client.V1JobSpec(
-                template=client.V1PodTemplateSpec(
-                    metadata=client.V1ObjectMeta(labels={"job": job_name, "pr-number": str(pr)}),
-                    spec=client.V1PodSpec(
-                        containers=[
-                            client.V1Container(
-                                name="trainer",
-                                command=payload["command"],
-                                image=image,
-                                args=mapped_args,
-                                resources=client.V1ResourceRequirements(
-                                    limits={"nvidia.com/gpu": "1"}  # GPU 요청
-                                ),
-                                env=[
-                                    client.V1EnvVar(name="NVIDIA_VISIBLE_DEVICES", value="all"),
-                                    client.V1EnvVar(name="NVIDIA_DRIVER_CAPABILITIES", value="compute,utility"),
-                                    client.V1EnvVar(name="name", value=job_name),
-                                    client.V1EnvVar(name="experiment_name", value=payload["experiment_name"]),
-                                    client.V1EnvVar(
-                                name="AWS_ACCESS_KEY_ID",
-                                    value_from=client.V1EnvVarSource(
-                                    secret_key_ref=client.V1SecretKeySelector(
-                        name="mlflow-minio-credentials",
-                key="aws-access-key-id"
-            )
-        )
-    ),
-    client.V1EnvVar(
-        name="AWS_SECRET_ACCESS_KEY",
-        value_from=client.V1EnvVarSource(
-            secret_key_ref=client.V1SecretKeySelector(
-                name="mlflow-minio-credentials",
-                key="aws-secret-access-key"
-            )
-        )
-    ),
-    client.V1EnvVar(
-        name="AWS_DEFAULT_REGION",
-        value_from=client.V1EnvVarSource(
-            secret_key_ref=client.V1SecretKeySelector(
-                name="mlflow-minio-credentials",
-                key="aws-default-region"
-            )
-        )
-    ),
-    
-    # MLflow S3 엔드포인트 (공개 설정)
-    client.V1EnvVar(name="MLFLOW_S3_ENDPOINT_URL", value="http://minio-service:9000")
-                                ],
-                                volume_mounts=[
-                                    client.V1VolumeMount(
-                                        name="training-data",
-                                        mount_path="/data",
-                                        read_only=True
-                                    ),
-                                    # GPU Device Files
-                                    client.V1VolumeMount(name="nvidia0", mount_path="/dev/nvidia0"),
-                                    client.V1VolumeMount(name="nvidiactl", mount_path="/dev/nvidiactl"),
-                                    client.V1VolumeMount(name="nvidia-uvm", mount_path="/dev/nvidia-uvm"),
-                                    client.V1VolumeMount(name="nvidia-uvm-tools", mount_path="/dev/nvidia-uvm-tools"),
-                                    client.V1VolumeMount(name="nvidia-modeset", mount_path="/dev/nvidia-modeset"),
-                                    # NVIDIA Binaries
-                                    client.V1VolumeMount(name="nvidia-smi", mount_path="/usr/bin/nvidia-smi"),
-                                    # NVIDIA Libraries
-                                    client.V1VolumeMount(name="libcuda-so-1", mount_path="/usr/lib/x86_64-linux-gnu/libcuda.so.1"),
-                                    client.V1VolumeMount(name="libnvidia-ml-so-1", mount_path="/usr/lib/x86_64-linux-gnu/libnvidia-ml.so.1")
-                                ]
-                            )
-                        ],
-                        volumes=[
-                            client.V1Volume(
-                                name="training-data",
-                                persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                    claim_name="training-data-pvc-v2"
-                                )
-                            ),
-                            # GPU Device Files
-                            client.V1Volume(name="nvidia0", host_path=client.V1HostPathVolumeSource(path="/dev/nvidia0")),
-                            client.V1Volume(name="nvidiactl", host_path=client.V1HostPathVolumeSource(path="/dev/nvidiactl")),
-                            client.V1Volume(name="nvidia-uvm", host_path=client.V1HostPathVolumeSource(path="/dev/nvidia-uvm")),
-                            client.V1Volume(name="nvidia-uvm-tools", host_path=client.V1HostPathVolumeSource(path="/dev/nvidia-uvm-tools")),
-                            client.V1Volume(name="nvidia-modeset", host_path=client.V1HostPathVolumeSource(path="/dev/nvidia-modeset")),
-                            # NVIDIA Binaries
-                            client.V1Volume(name="nvidia-smi", host_path=client.V1HostPathVolumeSource(path="/usr/bin/nvidia-smi")),
-                            # NVIDIA Libraries
-                            client.V1Volume(name="libcuda-so-1", host_path=client.V1HostPathVolumeSource(path="/usr/lib/x86_64-linux-gnu/libcuda.so.1")),
-                            client.V1Volume(name="libnvidia-ml-so-1", host_path=client.V1HostPathVolumeSource(path="/usr/lib/x86_64-linux-gnu/libnvidia-ml.so.1"))
-                        ],
-                        restart_policy="Never",
-                        node_selector={"accelerator": "nvidia"}
-                    )
-                ),
-                backoff_limit=2
-            )
-        )
-
-        # Job 생성
-        batch_v1.create_namespaced_job(namespace="default", body=job)
-        print(f"[+] Created job: {job_name}")
+def submit_batch(batch_v1, executor, items):
+    # K8s API 호출을 스레드 풀에서 동시에 실행해서 burst 때 지연이 쌓이지 않게 함
+    return list(executor.map(lambda data: submit_job(batch_v1, data), items))
 
+
+def report_metrics(r, results, queue_depth):
+    latencies = sorted(latency for _, _, latency, _ in results)
+    failed = sum(1 for _, _, _, error in results if error)
+    metrics = {
+        "batch_size": len(results),
+        "failed": failed,
+        "queue_depth": queue_depth,
+        "submit_latency_avg_ms": round(1000 * sum(latencies) / len(latencies), 1),
+        "submit_latency_max_ms": round(1000 * latencies[-1], 1),
+        "updated_at": time.time(),
+    }
+    print(f"[METRIC] submitted={len(results) - failed} failed={failed} queue_depth={queue_depth} "
+          f"latency_avg={metrics['submit_latency_avg_ms']}ms max={metrics['submit_latency_max_ms']}ms")
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(METRICS_KEY, mapping=metrics)
+    pipe.hincrby(METRICS_KEY, "total_submitted", len(results) - failed)
+    pipe.hincrby(METRICS_KEY, "total_failed", failed)
+    pipe.execute()
+
+
+def main():
+    print("[INFO] Starting train-worker...")
+
+    print(f"[INFO] Connecting to Redis at {REDIS_HOST}:{REDIS_PORT}")
+    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+    try:
+        r.ping()
+        print("[INFO] Redis connection successful")
     except Exception as e:
-        print(f"[!] Error: {e}")
-        time.sleep(3)
-## 23112
\ No newline at end of file
+        print(f"[ERROR] Redis connection failed: {e}")
+        exit(1)
+
+    # K8s 클러스터 접근 설정
+    print("[INFO] Initializing Kubernetes client...")
+    config.load_incluster_config()  # 쿠버네티스 클러스터 안에서 실행할 경우
+
+    batch_v1 = client.BatchV1Api()
+    executor = ThreadPoolExecutor(max_workers=SUBMIT_CONCURRENCY)
+    queue = ReliableQueue(r, WORKER_ID, queue=QUEUE_NAME, visibility_timeout=VISIBILITY_TIMEOUT,
+                          max_attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE)
+    scheduler = FairScheduler(r)
+    cache = ResultCache(r, MLFLOW_URL) if RESULT_CACHE else None
+
+    print(f"[INFO] Worker {WORKER_ID} ready. Waiting for jobs in {QUEUE_NAME} queue "
+          f"(batch={BATCH_SIZE}, concurrency={SUBMIT_CONCURRENCY}, max_gpus={MAX_GPUS}, "
+          f"result_cache={RESULT_CACHE})...")
+    last_reap = 0
+    while True:
+        try:
+            # 재시도 시각이 된 Job / 타임아웃된 in-flight Job 복구
+            queue.promote_delayed()
+            if time.time() - last_reap > REAP_INTERVAL:
+                requeued = queue.requeue_expired()
+                if requeued:
+                    print(f"[WARN] Requeued {requeued} expired in-flight job(s)")
+                last_reap = time.time()
+
+            # 남은 GPU에 들어가는 만큼 스케줄러에서 꺼내서 제출 (GPU 없는 Job은 항상)
+            pending = scheduler.depth()
+            if pending:
+                free = max(MAX_GPUS - count_active_gpus(batch_v1), 0)
+                ready = scheduler.take(BATCH_SIZE, queue, cost=payload_gpus, budget=free)
+                if ready:
+                    results = submit_batch(batch_v1, executor, ready)
+                    handle_results(queue, results)
+                    report_metrics(r, results, pending - len(ready))
+
+            # 새로 들어온 요청은 스케줄러 slot으로 (같은 PR의 이전 sha는 대체)
+            items, _ = queue.fetch(BATCH_SIZE)
+            if items:
+                print(f"[INFO] Received {len(items)} job(s)")
+                admit_items(batch_v1, queue, scheduler, items, cache)
+
+        except Exception as e:
+            print(f"[!] Error: {e}")
+            time.sleep(3)
+
+
+if __name__ == "__main__":
+    main()
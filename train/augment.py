@@ -0,0 +1,115 @@
+# augment.py
+# 디바이스로 옮긴 uint8 배치 전체에 한 번에 적용하는 augmentation / 정규화
+#   - CPU(DataLoader 워커)는 디코딩 + 리사이즈만 하고 uint8 그대로 보냄 → float 변환 / 정규화 / 3채널 확장은 디바이스에서
+#   - 좌우 반전 / affine(회전, 이동, 확대)은 image와 mask에 같은 파라미터로 (샘플마다 다른 값, 배치는 grid_sample 한 번)
+#   - 밝기 / 대비 jitter는 image만
+# Trainer(augment=...)는 학습 배치에만 적용 (검증 / 테스트는 prepare만)
+
+import math
+import torch
+import torch.nn.functional as F
+from loader import str2bool
+
+# ImageNet pretrained (resnet) 입력 정규화 - inference-api / predict.py의 T.Normalize와 같은 값
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def add_augment_args(parser):
+    parser.add_argument("--augment", type=str2bool, default=False, help="Random augmentation of training batches on device")
+    parser.add_argument("--hflip", type=float, default=0.5, help="Horizontal flip probability")
+    parser.add_argument("--rotate", type=float, default=10, help="Max rotation (degrees)")
+    parser.add_argument("--translate", type=float, default=0.05, help="Max translation (fraction of image size)")
+    parser.add_argument("--scale", type=float, default=0.1, help="Max zoom in / out (fraction)")
+    parser.add_argument("--brightness", type=float, default=0.1, help="Max brightness shift (image only)")
+    parser.add_argument("--contrast", type=float, default=0.1, help="Max contrast change (fraction, image only)")
+
+
+def to_float(x):
+    # uint8로 받아서 디바이스로 옮긴 뒤 [0, 1] float로 변환
+    if x.dtype == torch.uint8:
+        return x.float().div_(255)
+    return x
+
+
+def uniform(n, limit, device):
+    return (torch.rand(n, device=device) * 2 - 1) * limit
+
+
+class Normalize:
+    """prepare(x, y): uint8 → float, 1채널이면 mean 길이만큼 확장, 채널별 정규화 (전부 디바이스에서)"""
+
+    def __init__(self, device, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.mean = torch.tensor(mean, device=device).view(1, -1, 1, 1)
+        self.std = torch.tensor(std, device=device).view(1, -1, 1, 1)
+
+    def __call__(self, x, y):
+        x = to_float(x)
+        if x.size(1) == 1:
+            # Grayscale(num_output_channels=3)와 같음 - 복사 없이 expand, 아래 연산에서 3채널 텐서가 새로 만들어짐
+            x = x.expand(-1, self.mean.size(1), -1, -1)
+        return (x - self.mean) / self.std, y
+
+
+class PairedAugment:
+    """augment(x, y): 배치 단위 랜덤 augmentation → [0, 1] float
+
+    masks=True면 y도 (B, 1, H, W) mask로 보고 image와 같은 기하 변환 적용 (분류는 masks=False, y는 그대로)
+    """
+
+    def __init__(self, args, masks=True):
+        self.masks = masks
+        self.hflip = args.hflip
+        self.rotate = math.radians(args.rotate)
+        self.translate = args.translate
+        self.scale = args.scale
+        self.brightness = args.brightness
+        self.contrast = args.contrast
+
+    @property
+    def params(self):
+        return {"hflip": self.hflip, "rotate": math.degrees(self.rotate), "translate": self.translate,
+                "scale": self.scale, "brightness": self.brightness, "contrast": self.contrast}
+
+    def __call__(self, x, y):
+        x = to_float(x)
+        if self.masks:
+            y = to_float(y)
+
+        if self.rotate or self.translate or self.scale:
+            grid = self._grid(x)
+            x = F.grid_sample(x, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+            if self.masks:
+                y = F.grid_sample(y, grid, mode="bilinear", padding_mode="zeros", align_corners=False)
+        elif self.hflip:
+            # 기하 변환이 반전뿐이면 grid_sample 없이
+            flip = (torch.rand(x.size(0), device=x.device) < self.hflip).view(-1, 1, 1, 1)
+            x = torch.where(flip, x.flip(-1), x)
+            if self.masks:
+                y = torch.where(flip, y.flip(-1), y)
+
+        if self.brightness or self.contrast:
+            x = self._jitter(x)
+        return x, y
+
+    def _grid(self, x):
+        """샘플별 affine(출력 좌표 → 입력 좌표, [-1, 1] 정규화 좌표) → sampling grid"""
+        n, device = x.size(0), x.device
+        angle = uniform(n, self.rotate, device)
+        zoom = 1 + uniform(n, self.scale, device)
+        flip = torch.where(torch.rand(n, device=device) < self.hflip, -1.0, 1.0)
+        cos, sin = torch.cos(angle) / zoom, torch.sin(angle) / zoom
+        # 정규화 좌표계 폭이 2이므로 이동량은 2배
+        tx, ty = uniform(n, 2 * self.translate, device), uniform(n, 2 * self.translate, device)
+        theta = torch.stack([
+            torch.stack([cos * flip, -sin, tx], dim=1),
+            torch.stack([sin * flip, cos, ty], dim=1),
+        ], dim=1)
+        return F.affine_grid(theta, x.shape, align_corners=False)
+
+    def _jitter(self, x):
+        n, device = x.size(0), x.device
+        contrast = (1 + uniform(n, self.contrast, device)).view(-1, 1, 1, 1)
+        brightness = uniform(n, self.brightness, device).view(-1, 1, 1, 1)
+        mean = x.mean(dim=(1, 2, 3), keepdim=True)
+        return ((x - mean) * contrast + mean + brightness).clamp_(0, 1)
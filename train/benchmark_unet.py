@@ -0,0 +1,107 @@
+# benchmark_unet.py
+# UNet 설정별 파라미터 수 / FLOPs / CPU forward 지연시간 비교
+#
+# 예)
+#   python benchmark_unet.py
+#   python benchmark_unet.py --configs "base=64,depth=4" "base=16,depth=4,separable,batchnorm,bilinear" --threads 4
+
+import time
+import json
+import argparse
+import torch
+import torch.nn as nn
+from unet import UNet
+
+DEFAULT_CONFIGS = [
+    "base=64,depth=4",
+    "base=32,depth=4",
+    "base=32,depth=4,bilinear",
+    "base=16,depth=4,batchnorm",
+    "base=32,depth=4,separable,batchnorm,bilinear",
+    "base=16,depth=3,separable,batchnorm,bilinear",
+]
+
+
+def parse_config(text):
+    """"base=32,depth=4,separable" → UNet kwargs"""
+    kwargs = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        key, _, value = part.partition("=")
+        kwargs[key] = int(value) if value else True
+    return kwargs
+
+
+def count_flops(model, x):
+    """Conv / ConvTranspose 곱셈-덧셈 수 × 2 (BN / ReLU / pooling은 무시할 만큼 작아서 제외)"""
+    total = 0
+
+    def conv_hook(module, inputs, output):
+        nonlocal total
+        kernel = module.kernel_size[0] * module.kernel_size[1] * (module.in_channels // module.groups)
+        if isinstance(module, nn.ConvTranspose2d):
+            # 입력 픽셀마다 kernel 전체를 출력에 더함
+            total += inputs[0].numel() * kernel * module.out_channels // module.in_channels * 2
+        else:
+            total += output.numel() * kernel * 2
+
+    hooks = [m.register_forward_hook(conv_hook) for m in model.modules()
+             if isinstance(m, (nn.Conv2d, nn.ConvTranspose2d))]
+    with torch.no_grad():
+        model(x)
+    for h in hooks:
+        h.remove()
+    return total
+
+
+def measure_latency(model, x, warmup, runs):
+    with torch.inference_mode():
+        for _ in range(warmup):
+            model(x)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.9)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help='e.g. "base=32,depth=4,bilinear"')
+    parser.add_argument("--image_size", type=int, default=256, help="Input size")
+    parser.add_argument("--batch_size", type=int, default=1, help="Batch size")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads (0 = torch default)")
+    parser.add_argument("--warmup", type=int, default=3, help="Warm-up iterations")
+    parser.add_argument("--runs", type=int, default=10, help="Timed iterations")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    x = torch.rand(args.batch_size, 1, args.image_size, args.image_size)
+
+    results = []
+    print(f"{'config':<48} {'params(M)':>10} {'GFLOPs':>8} {'p50(ms)':>9} {'p90(ms)':>9}")
+    for config in args.configs:
+        model = UNet(**parse_config(config)).eval()
+        params = sum(p.numel() for p in model.parameters())
+        flops = count_flops(model, x[:1])
+        p50, p90 = measure_latency(model, x, args.warmup, args.runs)
+        results.append({
+            "config": config,
+            "params": params,
+            "gflops": flops / 1e9,
+            "latency_p50_ms": p50,
+            "latency_p90_ms": p90,
+        })
+        print(f"{config:<48} {params / 1e6:>10.2f} {flops / 1e9:>8.2f} {p50:>9.1f} {p90:>9.1f}")
+
+    print(f"[INFO] input {args.batch_size}x1x{args.image_size}x{args.image_size}, threads {torch.get_num_threads()}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# checkpoint.py
+# 학습 상태 체크포인트 저장 / 재시작 시 이어서 학습
+# Job이 backoff_limit으로 재시도되면 같은 Job 이름(env "name")의 MLflow run을 찾아 다시 붙고
+# 마지막 체크포인트(model, optimizer, scaler, epoch/step)부터 이어서 학습
+
+import os
+import tempfile
+import torch
+import mlflow
+from mlflow.tracking import MlflowClient
+
+ARTIFACT_DIR = "checkpoints"
+CHECKPOINT_FILE = "last.pt"
+BEST_FILE = "best.pt"
+
+
+def add_checkpoint_args(parser):
+    parser.add_argument("--checkpoint_every", type=int, default=1, help="Save a checkpoint every N epochs (0 = off)")
+    parser.add_argument("--checkpoint_dir", type=str, default=None,
+                        help="Writable directory for checkpoints (default: MLflow artifact store only)")
+
+
+def find_resumable_run(experiment_id, job_name):
+    """같은 Job 이름으로 시작했지만 끝나지 않은 run id (없으면 None)"""
+    if not job_name:
+        return None
+    runs = MlflowClient().search_runs(
+        [experiment_id],
+        filter_string=f'tags.job_name = "{job_name}"',
+        order_by=["attributes.start_time DESC"],
+        max_results=1,
+    )
+    if runs and runs[0].info.status != "FINISHED":
+        return runs[0].info.run_id
+    return None
+
+
+class Checkpointer:
+    """main=False(DDP rank 0이 아닌 프로세스)면 save는 건너뛰고 load만 함"""
+
+    def __init__(self, args, job_name, main=True):
+        self.main = main
+        self.every = args.checkpoint_every
+        self.local_dir = os.path.join(args.checkpoint_dir, job_name or "local") if args.checkpoint_dir else None
+        self.tmp_dir = tempfile.mkdtemp(prefix="ckpt-")
+
+    @property
+    def enabled(self):
+        return self.every > 0
+
+    def should_save(self, epoch):
+        return self.enabled and (epoch + 1) % self.every == 0
+
+    def save(self, state, filename=CHECKPOINT_FILE):
+        if not self.main:
+            return
+        path = os.path.join(self.local_dir or self.tmp_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 저장 중에 Pod가 죽어도 이전 체크포인트가 깨지지 않도록 rename으로 교체
+        torch.save(state, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        if not self.local_dir:
+            mlflow.log_artifact(path, ARTIFACT_DIR)
+        print(f"[INFO] Checkpoint saved: {filename} (epoch {state['epoch'] + 1})")
+
+    def load(self, run_id, map_location, filename=CHECKPOINT_FILE):
+        """로컬 디렉토리 → 현재 run의 MLflow artifact 순서로 찾음 (없으면 None)"""
+        if self.local_dir:
+            path = os.path.join(self.local_dir, filename)
+            if os.path.exists(path):
+                return torch.load(path, map_location=map_location)
+        if run_id:
+            try:
+                path = MlflowClient().download_artifacts(run_id, f"{ARTIFACT_DIR}/{filename}", self.tmp_dir)
+                return torch.load(path, map_location=map_location)
+            except Exception as e:
+                print(f"[INFO] No {filename} for run {run_id}: {e}")
+        return None
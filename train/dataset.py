@@ -1,31 +1,274 @@
 import os
-from torch.utils.data import Dataset
+import hashlib
+import json
+import argparse
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Subset
 from PIL import Image
+from split import load_metadata, locate_metadata
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def pair_key(name):
+    """image / mask 파일 이름 → 공통 id (CHNCXR_0001_0_mask.png → CHNCXR_0001_0)"""
+    stem = os.path.splitext(name)[0]
+    return stem[:-len("_mask")] if stem.endswith("_mask") else stem
+
+
+def list_files(directory):
+    return {
+        pair_key(name): name for name in sorted(os.listdir(directory))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    }
+
+
+def pair_stat(image_dir, mask_dir, image, mask):
+    image_st = os.stat(os.path.join(image_dir, image))
+    mask_st = os.stat(os.path.join(mask_dir, mask))
+    return [image_st.st_size, image_st.st_mtime_ns, mask_st.st_size, mask_st.st_mtime_ns]
+
+
+def build_manifest(image_dir, mask_dir, metadata_path=None):
+    """디렉토리를 한 번 스캔해서 id 기준으로 image / mask를 짝지음 (짝이 없는 파일은 따로 기록)"""
+    images = list_files(image_dir)
+    masks = list_files(mask_dir)
+    metadata = load_metadata(metadata_path) if metadata_path and os.path.exists(metadata_path) else {}
+
+    entries = []
+    for key in sorted(images.keys() & masks.keys()):
+        with Image.open(os.path.join(image_dir, images[key])) as im:
+            width, height = im.size   # 헤더만 읽음
+        entries.append({
+            "id": key,
+            "image": images[key],
+            "mask": masks[key],
+            "width": width,
+            "height": height,
+            "stat": pair_stat(image_dir, mask_dir, images[key], masks[key]),
+            "meta": metadata.get(key, {}),
+        })
+
+    return {
+        "version": MANIFEST_VERSION,
+        "image_dir": os.path.abspath(image_dir),
+        "mask_dir": os.path.abspath(mask_dir),
+        "dir_mtimes": dir_mtimes(image_dir, mask_dir),
+        "metadata": os.path.abspath(metadata_path) if metadata else None,
+        "entries": entries,
+        "unmatched_images": sorted(images[k] for k in images.keys() - masks.keys()),
+        "unmatched_masks": sorted(masks[k] for k in masks.keys() - images.keys()),
+    }
+
+
+def dir_mtimes(image_dir, mask_dir):
+    # 디렉토리 mtime은 파일이 추가 / 삭제 / 이름 변경될 때 바뀜 → 스캔 없이 stat 두 번으로 변경 감지
+    return [os.stat(image_dir).st_mtime_ns, os.stat(mask_dir).st_mtime_ns]
+
+
+def manifest_path(image_dir, mask_dir, manifest_dir):
+    key = hashlib.sha1(f"{os.path.abspath(image_dir)}\n{os.path.abspath(mask_dir)}".encode()).hexdigest()[:12]
+    return os.path.join(manifest_dir, f"manifest-{key}.json")
+
+
+def load_manifest(image_dir, mask_dir, cache_dir=None, metadata_path=None, rebuild=False):
+    """저장된 manifest가 최신이면 그대로 읽고, 아니면 새로 만들어서 저장 (저장 못 하면 메모리에서만 사용)
+
+    찾는 위치: cache_dir → data_dir (image / mask 디렉토리의 상위)
+    """
+    data_dir = os.path.dirname(os.path.abspath(image_dir))
+    paths = [manifest_path(image_dir, mask_dir, d) for d in dict.fromkeys(filter(None, (cache_dir, data_dir)))]
+    metadata_path = os.path.abspath(metadata_path) if metadata_path and os.path.exists(metadata_path) else None
+
+    if not rebuild:
+        mtimes = dir_mtimes(image_dir, mask_dir)
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                manifest = json.load(f)
+            if (manifest.get("version") == MANIFEST_VERSION
+                    and manifest["dir_mtimes"] == mtimes
+                    and manifest.get("metadata") == metadata_path):
+                return manifest
+            print(f"[INFO] Dataset manifest is stale: {path}")
+
+    manifest = build_manifest(image_dir, mask_dir, metadata_path)
+    for kind in ("images", "masks"):
+        unmatched = manifest[f"unmatched_{kind}"]
+        if unmatched:
+            print(f"[WARN] {len(unmatched)} {kind[:-1]}(s) without a pair, skipped: {unmatched[:5]}")
+
+    for path in paths:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, path)
+            print(f"[INFO] Wrote dataset manifest: {path} ({len(manifest['entries'])} pairs)")
+            break
+        except OSError as e:
+            # 읽기 전용 PVC면 저장하지 않고 사용 (dataset.py로 쓰기 가능한 마운트에서 미리 만들어 둘 수 있음)
+            print(f"[WARN] Could not save dataset manifest ({path}): {e}")
+    return manifest
+
+
+def default_metadata(image_dir):
+    # image_dir의 상위(data_dir)에서 찾음 - 순서는 split.py와 같음
+    return locate_metadata(os.path.dirname(os.path.abspath(image_dir)))
+
 
 class LungDataset(Dataset):
-    def __init__(self, image_dir, mask_dir, transform=None):
+    """id로 짝지은 (image, mask) 데이터셋
+
+    목록은 manifest(id → image, mask, 크기, MetaData.csv 행)에서 읽음 → 시작할 때 디렉토리를 다시 스캔하지 않음
+    """
+
+    def __init__(self, image_dir, mask_dir, transform=None, cache_dir=None, image_size=(256, 256),
+                 metadata_path=None, entries=None):
         self.image_dir = image_dir
         self.mask_dir = mask_dir
         self.transform = transform
+        self.image_size = image_size
+
+        if entries is None:
+            manifest = load_manifest(image_dir, mask_dir, cache_dir, metadata_path or default_metadata(image_dir))
+            entries = manifest["entries"]
+        self.entries = entries
+
+        # 캐시 모드: 디코딩 + 리사이즈된 (image, mask) 쌍을 uint8 memmap 하나에 저장해두고 재사용
+        self.cache_path = None
+        self._cache = None
+        if cache_dir:
+            self.cache_path = build_cache(self, cache_dir)
+
+    @property
+    def ids(self):
+        return [e["id"] for e in self.entries]
+
+    @property
+    def image_list(self):
+        return [e["image"] for e in self.entries]
+
+    @property
+    def mask_list(self):
+        return [e["mask"] for e in self.entries]
+
+    def filter(self, predicate):
+        """entry(dict: id, image, mask, width, height, meta) 조건으로 부분 데이터셋 (스캔 / 캐시 재생성 없음)"""
+        return Subset(self, [i for i, e in enumerate(self.entries) if predicate(e)])
 
-        self.image_list = sorted(os.listdir(image_dir))
-        self.mask_list = sorted(os.listdir(mask_dir))
-    
     def __len__(self):
-        return len(self.image_list)
-    
-    def __getitem__(self, idx):
-        image_path = os.path.join(self.image_dir, self.image_list[idx])
-        mask_path = os.path.join(self.mask_dir, self.mask_list[idx])
+        return len(self.entries)
+
+    def __getstate__(self):
+        # DataLoader 워커로 넘길 때 memmap 내용이 통째로 pickle 되지 않도록 핸들은 빼고 보냄
+        state = self.__dict__.copy()
+        state["_cache"] = None
+        return state
+
+    def load_pair(self, idx):
+        entry = self.entries[idx]
+        image_path = os.path.join(self.image_dir, entry["image"])
+        mask_path = os.path.join(self.mask_dir, entry["mask"])
 
         image = Image.open(image_path).convert('L')
         mask = Image.open(mask_path).convert('L')
+        return image, mask
+
+    def __getitem__(self, idx):
+        if self.cache_path:
+            if self._cache is None:
+                # copy-on-write 모드: 쓰기 가능한 배열이라 torch.from_numpy가 복사 없이 바로 감쌈
+                self._cache = np.load(self.cache_path, mmap_mode='c')
+            pair = torch.from_numpy(self._cache[idx])  # (2, H, W) uint8
+            return pair[0:1], pair[1:2]
+
+        image, mask = self.load_pair(idx)
 
         if self.transform:
             image = self.transform(image)
             mask = self.transform(mask)
-        
+
         return image, mask
 
 
+def cache_key(dataset):
+    """data_dir, 해상도, 파일 크기 / mtime 기준 캐시 키
+
+    manifest는 디렉토리 mtime이 바뀔 때만 다시 만들어지므로 (파일을 제자리에서 덮어쓰면 그대로)
+    크기 / mtime은 manifest 값이 아니라 지금 stat한 값을 씀 - 파일당 stat 두 번
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps([
+        os.path.abspath(dataset.image_dir),
+        os.path.abspath(dataset.mask_dir),
+        list(dataset.image_size),
+    ]).encode())
+    for entry in dataset.entries:
+        stat = pair_stat(dataset.image_dir, dataset.mask_dir, entry["image"], entry["mask"])
+        h.update(json.dumps([entry["image"], entry["mask"], stat]).encode())
+    return h.hexdigest()[:16]
+
+
+def build_cache(dataset, cache_dir):
+    """캐시 파일 경로 반환 (없으면 생성, 생성 불가하면 None → PNG 직접 디코딩)"""
+    height, width = dataset.image_size
+    path = os.path.join(cache_dir, f"lung-{height}x{width}-{cache_key(dataset)}.npy")
+    if os.path.exists(path):
+        print(f"[INFO] Using dataset cache: {path}")
+        return path
+
+    # 읽기 전용 PVC 등 캐시를 쓸 수 없는 경우엔 기존 방식으로 동작
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        arr = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.uint8, shape=(len(dataset), 2, height, width)
+        )
+    except OSError as e:
+        print(f"[WARN] Dataset cache disabled ({cache_dir}): {e}")
+        return None
+
+    print(f"[INFO] Building dataset cache: {path} ({len(dataset)} samples)")
+    for idx in range(len(dataset)):
+        image, mask = dataset.load_pair(idx)
+        arr[idx, 0] = np.asarray(image.resize((width, height), Image.BILINEAR))
+        arr[idx, 1] = np.asarray(mask.resize((width, height), Image.BILINEAR))
+    arr.flush()
+    del arr
+
+    # 같은 볼륨을 쓰는 다른 Job이 동시에 만들어도 rename은 원자적이라 안전
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    # manifest / 캐시 미리 생성 (쓰기 가능한 마운트에서 한 번 실행하면 이후 Job은 읽기 전용으로도 사용 가능)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data_dir", type=str, default="Chest-X-Ray", help="Data directory")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Cache directory (default: manifest only, next to data)")
+    parser.add_argument("--image_size", type=int, default=256, help="Image size")
+    parser.add_argument("--metadata", type=str, default=None, help="MetaData.csv path")
+    parser.add_argument("--rebuild_manifest", action="store_true", help="Rescan even if the manifest is fresh")
+    args = parser.parse_args()
+
+    image_dir = os.path.join(args.data_dir, "image")
+    mask_dir = os.path.join(args.data_dir, "mask")
+    metadata_path = args.metadata or default_metadata(image_dir)
+    manifest = load_manifest(image_dir, mask_dir, args.cache_dir, metadata_path, rebuild=args.rebuild_manifest)
+    print(f"[INFO] {len(manifest['entries'])} pairs, "
+          f"{len(manifest['unmatched_images'])} unmatched image(s), {len(manifest['unmatched_masks'])} unmatched mask(s)")
 
+    if args.cache_dir:
+        LungDataset(
+            image_dir,
+            mask_dir,
+            cache_dir=args.cache_dir,
+            image_size=(args.image_size, args.image_size),
+            metadata_path=metadata_path,
+            entries=manifest["entries"],
+        )
@@ -0,0 +1,93 @@
+# distributed.py
+# --distributed: torchrun으로 띄운 프로세스(GPU당 1개, CPU는 gloo) 여러 개로 DDP 학습
+#
+#   한 Pod / GPU 4장:  torchrun --standalone --nproc_per_node=4 train_unet_with_mlflow.py --distributed=true
+#   CPU 테스트:        torchrun --standalone --nproc_per_node=2 train_unet_with_mlflow.py --distributed=true --dist_backend=gloo
+#   여러 Pod:          train-worker가 Indexed Job + torchrun --nnodes / --node_rank로 실행 (job_template.py)
+#
+# --batch_size는 프로세스당 배치 (전체 배치 = batch_size × world_size)
+# MLflow 기록 / 체크포인트 저장은 rank 0만, early stop 같은 결정은 rank 0 값을 broadcast해서 모든 rank가 같이 멈춤
+
+import os
+from contextlib import nullcontext
+import torch
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import IterableDataset
+from torch.utils.data.distributed import DistributedSampler
+from loader import str2bool
+
+
+def add_distributed_args(parser):
+    parser.add_argument("--distributed", type=str2bool, default=False,
+                        help="DistributedDataParallel across torchrun processes")
+    parser.add_argument("--dist_backend", type=str, default=None,
+                        help="Process group backend (default: nccl on CUDA, gloo on CPU)")
+
+
+class Distributed:
+    """단일 프로세스일 땐 모든 메서드가 아무 일도 하지 않음 → 스크립트는 같은 코드로 두 모드를 처리"""
+
+    def __init__(self, args):
+        self.enabled = args.distributed and "RANK" in os.environ
+        if args.distributed and not self.enabled:
+            print("[WARN] --distributed without torchrun (RANK not set) - training in a single process")
+        self.rank = int(os.getenv("RANK", 0)) if self.enabled else 0
+        self.world_size = int(os.getenv("WORLD_SIZE", 1)) if self.enabled else 1
+        self.local_rank = int(os.getenv("LOCAL_RANK", 0)) if self.enabled else 0
+
+        cuda = torch.cuda.is_available()
+        if cuda and self.enabled:
+            torch.cuda.set_device(self.local_rank)
+            self.device = torch.device("cuda", self.local_rank)
+        else:
+            self.device = torch.device("cuda" if cuda else "cpu")
+
+        if self.enabled:
+            backend = args.dist_backend or ("nccl" if cuda else "gloo")
+            dist.init_process_group(backend)
+            print(f"[INFO] DDP rank {self.rank}/{self.world_size} (local {self.local_rank}, {backend}, {self.device})")
+
+    @property
+    def is_main(self):
+        return self.rank == 0
+
+    def wrap(self, model):
+        if not self.enabled:
+            return model
+        device_ids = [self.local_rank] if self.device.type == "cuda" else None
+        return DistributedDataParallel(model, device_ids=device_ids)
+
+    @staticmethod
+    def unwrap(model):
+        return model.module if isinstance(model, DistributedDataParallel) else model
+
+    def sampler(self, dataset, shuffle=False, seed=0):
+        """map-style 데이터셋을 rank끼리 나눔 (IterableDataset은 데이터셋이 직접 나눔 - shards.py)"""
+        if not self.enabled or isinstance(dataset, IterableDataset):
+            return None
+        return DistributedSampler(dataset, num_replicas=self.world_size, rank=self.rank, shuffle=shuffle, seed=seed)
+
+    def join(self, model):
+        # rank마다 배치 수가 다르면(샤드 스트리밍) 먼저 끝난 rank가 all-reduce에 빠져서 멈추지 않도록
+        if isinstance(model, DistributedDataParallel):
+            return model.join()
+        return nullcontext()
+
+    def all_reduce(self, tensor):
+        """모든 rank 합 (in-place)"""
+        if self.enabled:
+            dist.all_reduce(tensor)
+        return tensor
+
+    def broadcast(self, obj):
+        """rank 0의 값을 모든 rank에 (pickle 가능한 객체)"""
+        if not self.enabled:
+            return obj
+        objects = [obj]
+        dist.broadcast_object_list(objects, src=0)
+        return objects[0]
+
+    def close(self):
+        if self.enabled:
+            dist.destroy_process_group()
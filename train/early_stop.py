@@ -0,0 +1,104 @@
+# early_stop.py
+# 검증 지표 기준 early stopping + 학습 시간 제한
+# GPU가 한 대라 수렴했거나 발산하는 PR Job이 슬롯을 오래 잡고 있지 않도록 epoch 단위로 중단
+
+import time
+from checkpoint import BEST_FILE
+
+
+def add_early_stop_args(parser):
+    parser.add_argument("--patience", type=int, default=0,
+                        help="Stop after N epochs without validation improvement (0 = off)")
+    parser.add_argument("--min_delta", type=float, default=0.0, help="Minimum change that counts as an improvement")
+    parser.add_argument("--max_minutes", type=float, default=0,
+                        help="Training time budget in minutes (0 = off)")
+
+
+class EarlyStopping:
+    """update(value, epoch, model)로 최고 성능 weights를 기억하고 check(epoch)로 중단 사유를 판단
+
+    중단 사유: "patience" (개선 없음), "time_budget" (다음 epoch까지 돌면 시간 초과),
+              "pruned" (sweep trial인데 다른 trial들보다 나쁨 - sweep.MedianPruner)
+    """
+
+    def __init__(self, args, mode="max", pruner=None, dist=None):
+        self.patience = args.patience
+        self.min_delta = args.min_delta
+        self.budget = args.max_minutes * 60
+        self.sign = 1 if mode == "max" else -1
+        self.pruner = pruner
+        # DDP: rank 0만 판단(시간 / MLflow 조회가 rank마다 다를 수 있음)하고 결과를 broadcast
+        self.dist = dist
+
+        self.start = time.time()
+        self.epochs_run = 0
+        self.best = None
+        self.best_epoch = None
+        self.bad_epochs = 0
+        self.best_state = None
+        self.last = None
+        self.reason = None
+
+    def update(self, value, epoch, model):
+        """개선됐으면 weights를 CPU에 복사해두고 True"""
+        self.last = value
+        if self.best is None or self.sign * (value - self.best) > self.min_delta:
+            self.best = value
+            self.best_epoch = epoch
+            self.bad_epochs = 0
+            self.best_state = {k: v.detach().to("cpu", copy=True) for k, v in model.state_dict().items()}
+            return True
+        self.bad_epochs += 1
+        return False
+
+    def check(self, epoch):
+        """이번 epoch에서 멈춰야 하면 사유 문자열, 아니면 None"""
+        self.epochs_run += 1
+        elapsed = time.time() - self.start
+        main = self.dist is None or self.dist.is_main
+        if main:
+            if self.patience and self.bad_epochs >= self.patience:
+                self.reason = "patience"
+            elif self.budget and elapsed + elapsed / self.epochs_run > self.budget:
+                # 지금까지의 평균 epoch 시간으로 다음 epoch이 예산 안에 끝날지 예측
+                self.reason = "time_budget"
+            elif self.pruner and self.last is not None and self.pruner.should_prune(epoch, self.last):
+                self.reason = "pruned"
+        if self.dist is not None:
+            self.reason = self.dist.broadcast(self.reason)
+        if self.reason and main:
+            print(f"[INFO] Early stop at epoch {epoch + 1}: {self.reason} "
+                  f"(best {self.best} at epoch {None if self.best_epoch is None else self.best_epoch + 1}, "
+                  f"{elapsed / 60:.1f} min)")
+        return self.reason
+
+    def state_dict(self):
+        return {
+            "elapsed": time.time() - self.start,
+            "epochs_run": self.epochs_run,
+            "best": self.best,
+            "best_epoch": self.best_epoch,
+            "bad_epochs": self.bad_epochs,
+            "reason": self.reason,
+        }
+
+    def load_state_dict(self, state):
+        # Job 재시도로 Pod가 바뀌어도 이미 쓴 시간은 예산에서 빠지도록
+        self.start = time.time() - state["elapsed"]
+        self.epochs_run = state["epochs_run"]
+        self.best = state["best"]
+        self.best_epoch = state["best_epoch"]
+        self.bad_epochs = state["bad_epochs"]
+        self.reason = state["reason"]
+
+    def restore_best(self, model, checkpointer=None, run_id=None):
+        """최고 성능 weights를 모델에 다시 로드 (재시작한 경우 best 체크포인트에서)"""
+        state = self.best_state
+        if state is None and checkpointer and run_id and self.best is not None:
+            best = checkpointer.load(run_id, map_location="cpu", filename=BEST_FILE)
+            state = best["model"] if best else None
+        if state is None:
+            return False
+        model.load_state_dict(state)
+        print(f"[INFO] Restored best weights from epoch {self.best_epoch + 1}")
+        return True
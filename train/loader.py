@@ -0,0 +1,38 @@
+# loader.py
+# UNet / classifier 학습 스크립트가 같이 쓰는 DataLoader 설정
+
+from torch.utils.data import DataLoader, IterableDataset
+
+
+def str2bool(v):
+    # worker가 params를 "--key=value" 문자열로 넘기므로 True/true/1 모두 허용
+    return str(v).lower() in ("1", "true", "yes", "y")
+
+
+def add_loader_args(parser):
+    parser.add_argument("--num_workers", type=int, default=4, help="DataLoader worker processes")
+    parser.add_argument("--prefetch_factor", type=int, default=2, help="Batches prefetched per worker")
+    parser.add_argument("--pin_memory", type=str2bool, default=True, help="Use pinned host memory (CUDA only)")
+    parser.add_argument("--persistent_workers", type=str2bool, default=True, help="Keep workers alive across epochs")
+
+
+def make_loader(dataset, args, device, batch_size=None, shuffle=False, sampler=None):
+    kwargs = {
+        "batch_size": batch_size or args.batch_size,
+        # IterableDataset(샤드 스트리밍)은 데이터셋이 직접 섞음, DDP면 DistributedSampler가 섞음
+        "shuffle": shuffle and sampler is None and not isinstance(dataset, IterableDataset),
+        "sampler": sampler,
+        "num_workers": args.num_workers,
+        "pin_memory": args.pin_memory and device.type == "cuda",
+    }
+    # prefetch_factor / persistent_workers는 멀티 프로세스 로딩일 때만 의미가 있음
+    if args.num_workers > 0:
+        kwargs["prefetch_factor"] = args.prefetch_factor
+        kwargs["persistent_workers"] = args.persistent_workers
+    return DataLoader(dataset, **kwargs)
+
+
+def to_device(batch, device):
+    # pinned memory에서 오는 텐서는 non_blocking으로 복사해서 연산과 겹치게 함
+    return tuple(x.to(device, non_blocking=True) for x in batch)
+
@@ -0,0 +1,81 @@
+# metrics.py
+# segmentation 검증 지표 (Dice / IoU / pixel accuracy)
+# 배치 단위로 GPU에서 계산하고 합계만 텐서로 누적 → compute()에서 한 번만 CPU로 가져옴
+
+import torch
+
+
+class SegmentationMetrics:
+    def __init__(self, device, threshold=0.5, eps=1e-6):
+        self.device = device
+        # sigmoid(logit) >= threshold 는 logit >= log(t / (1 - t)) 와 같으므로 sigmoid 계산을 생략
+        self.logit_threshold = float(torch.logit(torch.tensor(threshold)))
+        self.eps = eps
+        self.reset()
+
+    def reset(self):
+        # [dice 합, iou 합, 맞은 픽셀 수]
+        self.sums = torch.zeros(3, dtype=torch.float64, device=self.device)
+        self.images = 0
+        self.pixels = 0
+
+    @torch.no_grad()
+    def update(self, logits, masks):
+        pred = logits >= self.logit_threshold
+        target = masks >= 0.5
+        dims = tuple(range(1, pred.dim()))
+
+        inter = (pred & target).sum(dims, dtype=torch.float64)
+        pred_sum = pred.sum(dims, dtype=torch.float64)
+        target_sum = target.sum(dims, dtype=torch.float64)
+        union = pred_sum + target_sum - inter
+
+        # 이미지별 점수를 평균 (마스크가 비어 있고 예측도 비어 있으면 1)
+        dice = (2 * inter + self.eps) / (pred_sum + target_sum + self.eps)
+        iou = (inter + self.eps) / (union + self.eps)
+        correct = (pred == target).sum(dtype=torch.float64)
+
+        self.sums += torch.stack([dice.sum(), iou.sum(), correct])
+        self.images += pred.size(0)
+        self.pixels += pred.numel()
+
+    def sync(self, dist):
+        """DDP: rank별 누적값을 모두 합침 (compute 전에 호출)"""
+        counts = torch.tensor([self.images, self.pixels], dtype=torch.float64, device=self.device)
+        dist.all_reduce(self.sums)
+        dist.all_reduce(counts)
+        self.images, self.pixels = (int(c) for c in counts.tolist())
+
+    def compute(self):
+        dice, iou, correct = self.sums.tolist()
+        images = max(self.images, 1)
+        return {
+            "dice": dice / images,
+            "iou": iou / images,
+            "pixel_accuracy": correct / max(self.pixels, 1),
+        }
+
+
+class Accuracy:
+    """분류 정확도 (%) - 맞은 개수만 디바이스에서 누적"""
+
+    def __init__(self, device):
+        self.device = device
+        self.reset()
+
+    def reset(self):
+        self.correct = torch.zeros((), dtype=torch.int64, device=self.device)
+        self.total = 0
+
+    @torch.no_grad()
+    def update(self, logits, targets):
+        self.correct += (logits.argmax(1) == targets).sum()
+        self.total += targets.size(0)
+
+    def sync(self, dist):
+        total = torch.tensor(self.total, dtype=torch.int64, device=self.device)
+        dist.all_reduce(self.correct)
+        self.total = int(dist.all_reduce(total))
+
+    def compute(self):
+        return {"accuracy": 100 * self.correct.item() / max(self.total, 1)}
@@ -0,0 +1,54 @@
+# precision.py
+# mixed precision(autocast + GradScaler) / channels-last 설정
+
+import torch
+from loader import str2bool
+
+
+def add_precision_args(parser):
+    parser.add_argument("--amp", type=str2bool, default=False, help="Mixed precision (fp16 on CUDA, bf16 on CPU)")
+    parser.add_argument("--channels_last", type=str2bool, default=False, help="Use channels-last memory format")
+
+
+class Precision:
+    """--amp / --channels_last 옵션에 따라 autocast, loss scaling, 메모리 포맷을 처리"""
+
+    def __init__(self, args, device):
+        self.device_type = device.type
+        self.memory_format = torch.channels_last if args.channels_last else torch.contiguous_format
+
+        # CUDA는 fp16 + GradScaler, CPU는 bf16 (지원 안 되면 fp32로 동작)
+        if device.type == "cuda":
+            self.dtype = torch.float16
+            self.enabled = args.amp
+        else:
+            self.dtype = torch.bfloat16
+            self.enabled = args.amp and torch.backends.mkldnn.is_available()
+
+        use_scaler = self.enabled and self.dtype == torch.float16
+        if hasattr(torch.amp, "GradScaler"):
+            self.scaler = torch.amp.GradScaler(device.type, enabled=use_scaler)
+        else:
+            # torch < 2.3 (학습 이미지는 2.1)
+            self.scaler = torch.cuda.amp.GradScaler(enabled=use_scaler)
+
+    @property
+    def name(self):
+        return str(self.dtype).replace("torch.", "") if self.enabled else "float32"
+
+    def prepare_model(self, model):
+        return model.to(memory_format=self.memory_format)
+
+    def prepare_input(self, x):
+        if x.dim() == 4:
+            return x.contiguous(memory_format=self.memory_format)
+        return x
+
+    def autocast(self):
+        return torch.autocast(device_type=self.device_type, dtype=self.dtype, enabled=self.enabled)
+
+    def backward_step(self, loss, optimizer):
+        optimizer.zero_grad(set_to_none=True)
+        self.scaler.scale(loss).backward()
+        self.scaler.step(optimizer)
+        self.scaler.update()
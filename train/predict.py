@@ -0,0 +1,243 @@
+# predict.py
+# 학습된 모델로 이미지 폴더 일괄 추론 (+ TorchScript / ONNX export, images/sec 벤치마크)
+#
+# 예)
+#   python predict.py --model <run_id> --input_dir samples/ --output_dir preds/
+#   python predict.py --model runs:/<run_id>/model --export onnx --threads 4 ...
+#   python predict.py --model preds/model.onnx --task classifier ...
+
+import os
+import csv
+import json
+import time
+import inspect
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+import torchvision.transforms as T
+from torch.utils.data import Dataset, DataLoader
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+# 학습 스크립트와 같은 전처리 (train_unet_with_mlflow.py / train_classifier.py)
+PRESETS = {
+    "unet": {
+        "image_size": 256,
+        "transform": lambda size: T.Compose([T.Resize((size, size)), T.ToTensor()]),
+    },
+    "classifier": {
+        "image_size": 224,
+        "transform": lambda size: T.Compose([
+            T.Resize((size, size)),
+            T.Grayscale(num_output_channels=3),
+            T.ToTensor(),
+            T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ]),
+    },
+}
+
+
+class ImageDirDataset(Dataset):
+    """디렉토리의 이미지를 순서대로 읽음 → (tensor, index)"""
+
+    def __init__(self, paths, transform, image_size):
+        self.paths = paths
+        self.transform = transform
+        self.image_size = image_size
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        image = Image.open(self.paths[idx])
+        # JPEG은 draft 모드로 디코딩 단계에서 바로 축소 (원본 해상도 전체를 디코딩하지 않음)
+        image.draft("L", (self.image_size, self.image_size))
+        return self.transform(image.convert("L")), idx
+
+
+def list_images(input_dir):
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+class OnnxModel:
+    """onnxruntime 세션을 torch 모델처럼 호출"""
+
+    def __init__(self, path, threads):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        return torch.from_numpy(self.session.run(None, {self.input_name: x.numpy()})[0])
+
+
+def load_model(uri, device, threads=0):
+    """MLflow run id / runs:/ models:/ URI / 로컬 MLflow 모델 디렉토리 / .pt(TorchScript) / .onnx"""
+    if uri.endswith(".onnx"):
+        return OnnxModel(uri, threads)
+    if uri.endswith((".pt", ".ts")):
+        # optimize_for_inference(MKLDNN conv prepack 등)는 실행하는 머신 기준이라 로드할 때 적용
+        return torch.jit.optimize_for_inference(torch.jit.load(uri, map_location=device).eval())
+
+    import mlflow.pytorch
+
+    if not (os.path.isdir(uri) or uri.startswith(("runs:/", "models:/"))):
+        uri = f"runs:/{uri}/model"
+    print(f"[INFO] Loading model: {uri}")
+    return mlflow.pytorch.load_model(uri, map_location=device).eval()
+
+
+def model_format(uri):
+    if uri.endswith(".onnx"):
+        return "onnx"
+    if uri.endswith((".pt", ".ts")):
+        return "torchscript"
+    return "pytorch"
+
+
+def export_model(model, example, path, fmt):
+    """TorchScript(trace + freeze) 또는 ONNX로 저장 → 저장된 파일 경로"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with torch.no_grad():
+        if fmt == "torchscript":
+            torch.jit.freeze(torch.jit.trace(model, example)).save(path)
+        else:
+            kwargs = {}
+            # 새 torch는 dynamo exporter가 기본값 → 학습 이미지(torch 2.1)와 같은 TorchScript exporter 사용
+            if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+                kwargs["dynamo"] = False
+            torch.onnx.export(
+                model, example, path,
+                input_names=["image"], output_names=["output"],
+                dynamic_axes={"image": {0: "batch"}, "output": {0: "batch"}},
+                opset_version=17,
+                **kwargs,
+            )
+    print(f"[INFO] Exported {fmt} model: {path}")
+    return path
+
+
+def save_mask(prob, src_path, output_dir, threshold):
+    # 원본 해상도로 되돌려서 저장
+    size = Image.open(src_path).size
+    mask = Image.fromarray(((prob >= threshold) * 255).astype(np.uint8)).resize(size, Image.NEAREST)
+    name = os.path.splitext(os.path.basename(src_path))[0]
+    mask.save(os.path.join(output_dir, f"{name}_mask.png"))
+
+
+def run_inference(model, loader, paths, args):
+    """배치 단위로 추론하면서 결과를 바로 파일로 씀 → 벤치마크 dict"""
+    os.makedirs(args.output_dir, exist_ok=True)
+    writer = ThreadPoolExecutor(max_workers=2)
+    rows = []
+    compute_time = 0.0
+    images = 0
+    start = time.perf_counter()
+
+    with torch.inference_mode():
+        for batch_idx, (x, indices) in enumerate(loader):
+            t0 = time.perf_counter()
+            out = model(x).float()
+            dt = time.perf_counter() - t0
+            # 첫 배치는 warm-up (스레드 풀 / 메모리 할당)이라 compute 처리량에서 제외
+            if batch_idx > 0 or len(loader) == 1:
+                compute_time += dt
+                images += x.size(0)
+
+            if out.dim() == 4:
+                probs = torch.sigmoid(out[:, 0]).numpy()
+                for prob, idx in zip(probs, indices.tolist()):
+                    writer.submit(save_mask, prob, paths[idx], args.output_dir, args.threshold)
+            else:
+                probs = torch.softmax(out, dim=1).numpy()
+                for prob, idx in zip(probs, indices.tolist()):
+                    rows.append((os.path.basename(paths[idx]), int(prob.argmax()), prob))
+
+    writer.shutdown(wait=True)
+    total_time = time.perf_counter() - start
+
+    if rows:
+        classes = args.classes.split(",")
+        with open(os.path.join(args.output_dir, "predictions.csv"), "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["file", "prediction"] + [f"prob_{c}" for c in classes])
+            for name, pred, prob in rows:
+                label = classes[pred] if pred < len(classes) else pred
+                w.writerow([name, label] + [f"{p:.6f}" for p in prob])
+
+    return {
+        "images": len(paths),
+        "batch_size": args.batch_size,
+        "threads": torch.get_num_threads(),
+        "total_sec": total_time,
+        "images_per_sec": len(paths) / total_time if total_time > 0 else 0.0,
+        "compute_images_per_sec": images / compute_time if compute_time > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True,
+                        help="MLflow run id, runs:/ or models:/ URI, MLflow model dir, .pt or .onnx file")
+    parser.add_argument("--input_dir", type=str, required=True, help="Directory of images")
+    parser.add_argument("--output_dir", type=str, default="predictions", help="Where masks / predictions.csv go")
+    parser.add_argument("--task", type=str, default="unet", choices=list(PRESETS), help="Preprocessing preset")
+    parser.add_argument("--image_size", type=int, default=None, help="Override the preset input size")
+    parser.add_argument("--batch_size", type=int, default=16, help="Inference batch size")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for inference (0 = torch default)")
+    parser.add_argument("--num_workers", type=int, default=2, help="Image decoding worker processes")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Mask probability threshold (unet)")
+    parser.add_argument("--classes", type=str, default="NORMAL,PNEUMONIA", help="Class names (classifier)")
+    parser.add_argument("--export", type=str, default=None, choices=["torchscript", "onnx"],
+                        help="Export the model and run inference with the exported file")
+    parser.add_argument("--tracking_uri", type=str,
+                        default=os.getenv("MLFLOW_TRACKING_URI", "http://mlflow-service:5000"))
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device("cpu")
+
+    import mlflow
+    mlflow.set_tracking_uri(args.tracking_uri)
+
+    preset = PRESETS[args.task]
+    image_size = args.image_size or preset["image_size"]
+    paths = list_images(args.input_dir)
+    if not paths:
+        raise SystemExit(f"No images in {args.input_dir}")
+
+    dataset = ImageDirDataset(paths, preset["transform"](image_size), image_size)
+    loader = DataLoader(dataset, batch_size=args.batch_size, num_workers=args.num_workers)
+
+    model = load_model(args.model, device, args.threads)
+    if args.export:
+        if not isinstance(model, torch.nn.Module):
+            raise SystemExit("--export needs a PyTorch model (run id / MLflow model)")
+        example = dataset[0][0].unsqueeze(0)
+        ext = "pt" if args.export == "torchscript" else "onnx"
+        path = export_model(model, example, os.path.join(args.output_dir, f"model.{ext}"), args.export)
+        model = load_model(path, device, args.threads)
+
+    print(f"[INFO] Running inference on {len(paths)} image(s) (batch {args.batch_size}, threads {torch.get_num_threads()})")
+    bench = run_inference(model, loader, paths, args)
+    bench["model"] = args.model
+    bench["format"] = args.export or model_format(args.model)
+
+    with open(os.path.join(args.output_dir, "benchmark.json"), "w") as f:
+        json.dump(bench, f, indent=2)
+    print(f"[METRIC] {bench['images_per_sec']:.1f} images/sec end-to-end, "
+          f"{bench['compute_images_per_sec']:.1f} images/sec model only ({bench['format']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# shards.py
+# 작은 PNG/JPEG 수천 개 대신 큰 tar 샤드 몇 개로 묶어서 순차 읽기 (WebDataset 형식)
+#
+# 샤드 구조:
+#   <out_dir>/index.json              task, classes, split별 샤드 목록 / 샘플 수
+#   <out_dir>/<split>-00000.tar       <key>.image.png, <key>.mask.png (unet) | <key>.cls (classifier), <key>.json
+#
+# 변환 예)
+#   python shards.py unet --data_dir Chest-X-Ray --out_dir /scratch/lung-shards --image_size 256
+#   python shards.py classifier --data_dir /data/chest_xray --out_dir /scratch/cxr-shards --image_size 224
+
+import io
+import os
+import json
+import random
+import tarfile
+import argparse
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+from PIL import Image
+
+INDEX_FILE = "index.json"
+FORMAT = "xray-shards-v1"
+
+
+class ShardWriter:
+    """split별로 shard_size 개씩 tar 파일을 나눠서 씀"""
+
+    def __init__(self, out_dir, split, shard_size):
+        self.out_dir = out_dir
+        self.split = split
+        self.shard_size = shard_size
+        self.shards = []
+        self.tar = None
+        self.count = 0
+
+    def _open(self):
+        name = f"{self.split}-{len(self.shards):05d}.tar"
+        # 다 쓰기 전에 읽히지 않도록 tmp에 쓰고 close할 때 rename
+        self.tar = tarfile.open(os.path.join(self.out_dir, name + ".tmp"), "w")
+        self.shards.append({"file": name, "samples": 0})
+
+    def _close(self):
+        if self.tar:
+            self.tar.close()
+            name = self.shards[-1]["file"]
+            os.replace(os.path.join(self.out_dir, name + ".tmp"), os.path.join(self.out_dir, name))
+            self.tar = None
+
+    def write(self, key, files):
+        if self.tar is None or self.shards[-1]["samples"] >= self.shard_size:
+            self._close()
+            self._open()
+        # 같은 샘플의 파일은 연속으로 저장 → 읽을 때 key가 바뀌면 샘플 하나 완성
+        for ext, data in files.items():
+            info = tarfile.TarInfo(f"{key}.{ext}")
+            info.size = len(data)
+            info.mtime = 0
+            self.tar.addfile(info, io.BytesIO(data))
+        self.shards[-1]["samples"] += 1
+        self.count += 1
+
+    def close(self):
+        self._close()
+        return self.shards
+
+
+def encode_image(path, image_size=None):
+    """image_size가 없으면 원본 bytes 그대로, 있으면 리사이즈 후 PNG로 다시 인코딩"""
+    if not image_size:
+        with open(path, "rb") as f:
+            return f.read()
+    image = Image.open(path)
+    image.draft("L", (image_size, image_size))
+    image = image.convert("L").resize((image_size, image_size), Image.BILINEAR)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def write_index(out_dir, task, splits, classes=None):
+    index = {"format": FORMAT, "task": task, "classes": classes, "splits": splits}
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    total = {split: sum(s["samples"] for s in shards) for split, shards in splits.items()}
+    print(f"[INFO] Wrote {out_dir}/{INDEX_FILE}: {total}")
+
+
+def convert_unet(args):
+    from dataset import LungDataset
+    from split import split_dataset, find_metadata, load_metadata
+
+    dataset = LungDataset(os.path.join(args.data_dir, "image"), os.path.join(args.data_dir, "mask"))
+    path = find_metadata(args)
+    metadata = load_metadata(path) if path else {}
+
+    # train / val은 학습 스크립트와 같은 층화 분할로 미리 나눠서 저장
+    subsets = dict(zip(("train", "val"), split_dataset(dataset, args)))
+    splits = {}
+    for split, subset in subsets.items():
+        writer = ShardWriter(args.out_dir, split, args.shard_size)
+        for idx in subset.indices:
+            # image_list / mask_list는 접근할 때마다 전체 목록을 만드므로 entry를 직접 읽음
+            entry = dataset.entries[idx]
+            image_name = entry["image"]
+            stem = os.path.splitext(image_name)[0]
+            files = {
+                "image.png": encode_image(os.path.join(dataset.image_dir, image_name), args.image_size),
+                "mask.png": encode_image(os.path.join(dataset.mask_dir, entry["mask"]), args.image_size),
+                "json": json.dumps({"file": image_name, **metadata.get(stem, {})}).encode(),
+            }
+            writer.write(f"{idx:06d}", files)
+        splits[split] = writer.close()
+    write_index(args.out_dir, "unet", splits)
+
+
+def convert_classifier(args):
+    from torchvision.datasets import ImageFolder
+
+    splits = {}
+    classes = None
+    for split in ("train", "val", "test"):
+        root = os.path.join(args.data_dir, split)
+        if not os.path.isdir(root):
+            continue
+        folder = ImageFolder(root)
+        classes = classes or folder.classes
+        samples = list(folder.samples)
+        # 샤드 안에서도 클래스가 섞이도록 (ImageFolder는 클래스 순으로 정렬돼 있음)
+        random.Random(args.split_seed).shuffle(samples)
+
+        writer = ShardWriter(args.out_dir, split, args.shard_size)
+        for i, (path, label) in enumerate(samples):
+            files = {
+                "image.png": encode_image(path, args.image_size),
+                "cls": str(label).encode(),
+                "json": json.dumps({"file": os.path.relpath(path, args.data_dir)}).encode(),
+            }
+            writer.write(f"{i:06d}", files)
+        splits[split] = writer.close()
+    write_index(args.out_dir, "classifier", splits, classes)
+
+
+class DecodePair:
+    """unet 샘플 → (image, mask) - LungDataset과 같은 transform 적용"""
+
+    def __init__(self, transform):
+        self.transform = transform
+
+    def __call__(self, sample):
+        image = Image.open(io.BytesIO(sample["image.png"])).convert("L")
+        mask = Image.open(io.BytesIO(sample["mask.png"])).convert("L")
+        return self.transform(image), self.transform(mask)
+
+
+class DecodeLabel:
+    """classifier 샘플 → (image, label) - ImageFolder와 같은 transform 적용"""
+
+    def __init__(self, transform):
+        self.transform = transform
+
+    def __call__(self, sample):
+        image = Image.open(io.BytesIO(sample["image.png"])).convert("RGB")
+        return self.transform(image), int(sample["cls"])
+
+
+def load_index(shard_dir):
+    with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+        index = json.load(f)
+    if index.get("format") != FORMAT:
+        raise ValueError(f"Unknown shard format in {shard_dir}: {index.get('format')}")
+    return index
+
+
+class ShardDataset(IterableDataset):
+    """tar 샤드를 순서대로 스트리밍
+
+    - epoch마다 샤드 순서를 섞고, DDP rank / DataLoader 워커끼리 샤드를 나눠서 읽음 (rank × 워커 수 ≤ 샤드 수 권장)
+    - shuffle_buffer 크기만큼 샘플을 모아 버퍼 안에서 한 번 더 섞음
+    """
+
+    def __init__(self, shard_dir, split, decode, shuffle=True, shuffle_buffer=256):
+        self.shard_dir = shard_dir
+        self.split = split
+        self.decode = decode
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+
+        index = load_index(shard_dir)
+        self.classes = index.get("classes")
+        self.shards = index["splits"].get(split, [])
+        self.num_samples = sum(s["samples"] for s in self.shards)
+        self.epoch = 0
+        # DDP면 만들 때의 rank 기준으로 샤드를 나눔 (DataLoader 워커 프로세스에선 process group을 알 수 없음)
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            self.rank, self.world_size = torch.distributed.get_rank(), torch.distributed.get_world_size()
+        else:
+            self.rank, self.world_size = 0, 1
+
+    def __len__(self):
+        return self.num_samples
+
+    def _epoch_seed(self):
+        worker = get_worker_info()
+        if worker is not None:
+            # 워커 seed = DataLoader의 base_seed + worker id → 같은 DataLoader iterator의 워커들은 같은 값
+            # persistent_workers면 base_seed가 고정이라 워커 안에서 센 epoch 수를 더해서 매 epoch 순서를 바꿈
+            return worker.seed - worker.id + self.epoch
+        return int(torch.empty((), dtype=torch.int64).random_().item())
+
+    def _my_shards(self, seed):
+        # rank끼리는 seed가 달라도 겹치지 않도록 섞기 전에 고정된 순서로 나눔 (rank마다 샘플 수가 다른 건 DDP join이 처리)
+        shards = [s["file"] for s in self.shards][self.rank::self.world_size]
+        if self.shuffle:
+            random.Random(seed).shuffle(shards)
+        worker = get_worker_info()
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+        return shards
+
+    def _samples(self, shards):
+        for name in shards:
+            # "r|" : seek 없이 앞에서부터 순차로 읽음 (네트워크 스토리지에서 큰 블록 단위 읽기)
+            with tarfile.open(os.path.join(self.shard_dir, name), mode="r|") as tar:
+                key, sample = None, {}
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    member_key, _, ext = member.name.partition(".")
+                    if member_key != key and sample:
+                        yield sample
+                        sample = {}
+                    key = member_key
+                    sample[ext] = tar.extractfile(member).read()
+                if sample:
+                    yield sample
+
+    def __iter__(self):
+        seed = self._epoch_seed()
+        self.epoch += 1
+        samples = self._samples(self._my_shards(seed))
+        if not self.shuffle or self.shuffle_buffer <= 1:
+            for sample in samples:
+                yield self.decode(sample)
+            return
+
+        rng = random.Random(seed + 1)
+        buffer = []
+        for sample in samples:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(sample)
+                continue
+            i = rng.randrange(len(buffer))
+            buffer[i], sample = sample, buffer[i]
+            yield self.decode(sample)
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield self.decode(sample)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("task", choices=["unet", "classifier"], help="Dataset layout to convert")
+    parser.add_argument("--data_dir", type=str, required=True, help="Source data directory")
+    parser.add_argument("--out_dir", type=str, required=True, help="Where shards + index.json are written")
+    parser.add_argument("--shard_size", type=int, default=128, help="Samples per shard")
+    parser.add_argument("--image_size", type=int, default=None,
+                        help="Resize (and re-encode as PNG) before packing (default: keep original bytes)")
+    parser.add_argument("--val_fraction", type=float, default=0.2, help="unet: validation fraction")
+    parser.add_argument("--stratify", type=str, default="ptb,gender", help="unet: MetaData.csv columns")
+    parser.add_argument("--split_seed", type=int, default=42, help="Random seed for split / shuffling")
+    parser.add_argument("--metadata", type=str, default=None, help="unet: MetaData.csv path")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    if args.task == "unet":
+        convert_unet(args)
+    else:
+        convert_classifier(args)
@@ -0,0 +1,97 @@
+# split.py
+# MetaData.csv(ptb, gender 등) 기준 층화 train / validation 분할
+
+import os
+import csv
+import random
+from collections import defaultdict
+from torch.utils.data import Subset
+
+# 이미지와 같이 들어있는 메타데이터 (data_dir에 MetaData.csv가 있으면 그쪽을 우선 사용)
+DEFAULT_METADATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MetaData.csv")
+# MetaData.csv와 매칭되는 id가 이 비율보다 적으면 경고
+MIN_METADATA_MATCH = 0.5
+
+
+def add_split_args(parser):
+    parser.add_argument("--val_fraction", type=float, default=0.2, help="Fraction of samples held out for validation")
+    parser.add_argument("--stratify", type=str, default="ptb,gender",
+                        help="Comma separated MetaData.csv columns to stratify on (empty = random split)")
+    parser.add_argument("--split_seed", type=int, default=42, help="Random seed for the split")
+    parser.add_argument("--metadata", type=str, default=None, help="MetaData.csv path")
+
+
+def load_metadata(path):
+    """id → row (id는 파일 이름에서 확장자를 뺀 값과 매칭)"""
+    with open(path, newline="") as f:
+        return {row["id"]: row for row in csv.DictReader(f)}
+
+
+def find_metadata(args):
+    return locate_metadata(args.data_dir, args.metadata)
+
+
+def locate_metadata(data_dir, path=None):
+    # 지정한 경로 → data_dir/MetaData.csv → 코드와 같이 들어있는 MetaData.csv
+    for path in (path, os.path.join(data_dir, "MetaData.csv"), DEFAULT_METADATA):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def stratum_value(row, field):
+    # MetaData.csv의 gender는 "male", "M", "Female,", "male35yrs" 처럼 제각각이라 첫 글자(m/f)만 사용
+    value = row.get(field, "").strip().lower()
+    if field == "gender":
+        return value[:1]
+    return value
+
+
+def stratified_split(names, metadata, fields, val_fraction, seed=42):
+    """파일 이름(또는 id) 목록 → (train 인덱스, val 인덱스)
+
+    fields 값 조합마다 같은 비율로 validation에 보냄 (메타데이터가 없는 파일은 "unknown" 그룹)
+    """
+    groups = defaultdict(list)
+    for idx, name in enumerate(names):
+        row = metadata.get(os.path.splitext(name)[0])
+        key = tuple(stratum_value(row, f) for f in fields) if row else ("unknown",)
+        groups[key].append(idx)
+
+    rng = random.Random(seed)
+    train_idx, val_idx = [], []
+    for key in sorted(groups):
+        indices = groups[key]
+        rng.shuffle(indices)
+        n_val = round(len(indices) * val_fraction)
+        # 작은 그룹도 양쪽에 최소 하나씩은 들어가도록
+        if len(indices) > 1 and val_fraction > 0:
+            n_val = min(max(n_val, 1), len(indices) - 1)
+        val_idx.extend(indices[:n_val])
+        train_idx.extend(indices[n_val:])
+    return sorted(train_idx), sorted(val_idx)
+
+
+def split_dataset(dataset, args):
+    """LungDataset → (train Subset, val Subset)"""
+    fields = [f.strip() for f in args.stratify.split(",") if f.strip()]
+    if args.metadata is None and any(e["meta"] for e in dataset.entries):
+        # manifest에 이미 붙어 있는 MetaData.csv 행 사용
+        metadata = {e["id"]: e["meta"] for e in dataset.entries if e["meta"]}
+    else:
+        path = find_metadata(args) if fields else None
+        metadata = load_metadata(path) if path else {}
+    if fields and not metadata:
+        print("[WARN] MetaData.csv not found, using a random split")
+    elif fields:
+        # CSV는 있어도 id가 맞지 않으면 전부 "unknown" 그룹 → 사실상 랜덤 분할
+        matched = sum(1 for name in dataset.ids if os.path.splitext(name)[0] in metadata)
+        if matched == 0:
+            print(f"[WARN] No dataset ids found in MetaData.csv ({len(metadata)} rows), using a random split")
+        elif matched < len(dataset.ids) * MIN_METADATA_MATCH:
+            print(f"[WARN] Only {matched}/{len(dataset.ids)} dataset ids found in MetaData.csv, "
+                  f"the rest are split as \"unknown\"")
+
+    train_idx, val_idx = stratified_split(dataset.ids, metadata, fields, args.val_fraction, args.split_seed)
+    print(f"[INFO] Split: {len(train_idx)} train / {len(val_idx)} val (stratify: {fields or 'none'})")
+    return Subset(dataset, train_idx), Subset(dataset, val_idx)
@@ -0,0 +1,84 @@
+# sweep.py
+# 하이퍼파라미터 sweep trial 쪽 공용 코드 (sweep 생성 / 요약은 train-api)
+#   - worker가 MLFLOW_TAGS env(JSON)로 넘긴 태그 (sweep_id, trial, mlflow.parentRunId) → run에 기록
+#   - median pruning: 같은 sweep의 다른 trial들이 같은 epoch에 기록한 검증 지표의 중앙값보다 나쁘면 중단
+
+import os
+import json
+import statistics
+import mlflow
+from mlflow.tracking import MlflowClient
+from loader import str2bool
+
+# 이 상태의 trial은 metric이 더 기록되지 않음
+FINISHED_STATUSES = {"FINISHED", "FAILED", "KILLED"}
+
+
+def run_tags():
+    try:
+        return json.loads(os.getenv("MLFLOW_TAGS") or "{}")
+    except ValueError:
+        print(f"[WARN] Ignoring invalid MLFLOW_TAGS: {os.getenv('MLFLOW_TAGS')}")
+        return {}
+
+
+def add_sweep_args(parser):
+    parser.add_argument("--prune", type=str2bool, default=False,
+                        help="Stop this sweep trial when it is worse than the median of other trials")
+    parser.add_argument("--prune_warmup", type=int, default=1, help="Never prune before this many epochs")
+    parser.add_argument("--prune_min_trials", type=int, default=3,
+                        help="Other trials that must have reached the same epoch before pruning")
+
+
+class MedianPruner:
+    """EarlyStopping(pruner=...)에서 epoch마다 호출 → 중단해야 하면 True
+
+    sweep_id 태그가 없는 (sweep이 아닌) 학습에선 항상 꺼져 있음
+    """
+
+    def __init__(self, args, experiment_id, metric, mode="max"):
+        self.experiment_id = experiment_id
+        self.metric = metric
+        self.sign = 1 if mode == "max" else -1
+        self.warmup = args.prune_warmup
+        self.min_trials = args.prune_min_trials
+        self.sweep_id = run_tags().get("sweep_id")
+        self.enabled = args.prune and bool(self.sweep_id)
+        # 끝난 trial의 history는 더 바뀌지 않으므로 한 번만 조회 (run_id → {step: value})
+        self._histories = {}
+
+    def should_prune(self, epoch, value):
+        if not self.enabled or epoch + 1 < self.warmup:
+            return False
+        run = mlflow.active_run()
+        client = MlflowClient()
+        others = client.search_runs([self.experiment_id], f"tags.sweep_id = '{self.sweep_id}'", max_results=1000)
+
+        values = []
+        for other in others:
+            if run and other.info.run_id == run.info.run_id:
+                continue
+            # 최신 값만으론 몇 epoch 값인지 알 수 없으므로 history에서 같은 step(epoch)을 찾음
+            history = self._history(client, other.info)
+            if epoch in history:
+                values.append(history[epoch])
+        if len(values) < self.min_trials:
+            return False
+
+        median = statistics.median(values)
+        if self.sign * (value - median) < 0:
+            print(f"[INFO] Pruned at epoch {epoch + 1}: {self.metric} {value:.4f} "
+                  f"worse than median {median:.4f} of {len(values)} trial(s)")
+            return True
+        return False
+
+    def _history(self, client, info):
+        """step → value (step이 중복되면 처음 기록된 값), 실행 중인 trial만 매번 다시 조회"""
+        if info.run_id in self._histories:
+            return self._histories[info.run_id]
+        history = {}
+        for m in client.get_metric_history(info.run_id, self.metric):
+            history.setdefault(m.step, m.value)
+        if info.status in FINISHED_STATUSES:
+            self._histories[info.run_id] = history
+        return history
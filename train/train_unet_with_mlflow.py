@@ -2,13 +2,24 @@
 
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader
 import mlflow
 import mlflow.pytorch
 import torchvision.transforms as T
 import os
-from unet import UNet
+from contextlib import nullcontext
+from unet import add_model_args, build_unet
 from dataset import LungDataset
+from loader import add_loader_args, make_loader
+from precision import add_precision_args, Precision
+from checkpoint import add_checkpoint_args, find_resumable_run, Checkpointer, BEST_FILE
+from early_stop import add_early_stop_args, EarlyStopping
+from sweep import add_sweep_args, run_tags, MedianPruner
+from trainer import add_trainer_args, Trainer
+from split import add_split_args, split_dataset
+from shards import ShardDataset, DecodePair
+from metrics import SegmentationMetrics
+from distributed import add_distributed_args, Distributed
+from augment import add_augment_args, to_float, PairedAugment
 import argparse
 from dotenv import load_dotenv
 
@@ -20,6 +31,18 @@ parser.add_argument("--data_dir", type=str, default="Chest-X-Ray", help="Data di
 parser.add_argument("--batch_size", type=int, default=4, help="Batch size")
 parser.add_argument("--lr", type=float, default=0.001, help="Learning rate")
 parser.add_argument("--num_epochs", type=int, default=5, help="Number of epochs")
+parser.add_argument("--cache_dir", type=str, default=None, help="Preprocessed dataset cache directory")
+parser.add_argument("--shard_dir", type=str, default=None, help="Read train/val from tar shards (shards.py) instead of data_dir")
+add_model_args(parser)
+add_loader_args(parser)
+add_precision_args(parser)
+add_checkpoint_args(parser)
+add_early_stop_args(parser)
+add_sweep_args(parser)
+add_trainer_args(parser)
+add_split_args(parser)
+add_distributed_args(parser)
+add_augment_args(parser)
 args = parser.parse_args()
 
 image_dir = os.path.join(args.data_dir, "image")
@@ -30,63 +53,122 @@ num_epochs = args.num_epochs
 batch_size = args.batch_size
 lr = args.lr
 
-# 장치 설정
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# 장치 설정 (--distributed면 rank별 GPU, 샤드 / DistributedSampler도 rank 기준으로 나뉨)
+dist = Distributed(args)
+device = dist.device
 
-# 데이터셋
+# 데이터셋 (워커는 리사이즈까지만 - uint8로 보내고 float 변환 / augmentation은 디바이스에서 배치 단위로)
 transform = T.Compose([
     T.Resize((256, 256)),
-    T.ToTensor()
+    T.PILToTensor()
 ])
-dataset = LungDataset(image_dir, mask_dir, transform=transform)
-loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+if args.shard_dir:
+    # 샤드는 변환할 때 이미 train / val로 나뉘어 있음
+    train_set = ShardDataset(args.shard_dir, "train", DecodePair(transform))
+    val_set = ShardDataset(args.shard_dir, "val", DecodePair(transform), shuffle=False)
+else:
+    dataset = LungDataset(image_dir, mask_dir, transform=transform, cache_dir=args.cache_dir)
+    train_set, val_set = split_dataset(dataset, args)
+loader = make_loader(train_set, args, device, shuffle=True, sampler=dist.sampler(train_set, shuffle=True, seed=args.split_seed))
+# 검증도 rank끼리 나눠서 평가 후 합산 (DistributedSampler는 rank 수에 맞추려고 최대 world_size - 1개를 중복 평가)
+val_loader = make_loader(val_set, args, device, sampler=dist.sampler(val_set)) if len(val_set) else None
 
 # 모델 & 학습 설정
-model = UNet().to(device)
-criterion = nn.BCELoss()
+precision = Precision(args, device)
+model = precision.prepare_model(build_unet(args).to(device))
+criterion = nn.BCEWithLogitsLoss()
 optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+trainer = Trainer(dist.wrap(model), optimizer, criterion, precision, device,
+                  prepare=lambda x, y: (to_float(x), to_float(y)),
+                  log_every=args.log_every, loss_name="loss", dist=dist,
+                  augment=PairedAugment(args) if args.augment else None)
+val_metrics = SegmentationMetrics(device)
 
-# MLflow 설정
+# MLflow 설정 (experiment / run 생성과 기록은 rank 0만, 나머지 rank는 id만 받음)
 mlflow.set_tracking_uri("http://mlflow-service:5000")
-mlflow.set_experiment("unet-lung-segmentation")
-
-with mlflow.start_run():
-    mlflow.set_tag("job_name", job_name)
-    mlflow.log_param("lr", lr)
-    mlflow.log_param("batch_size", batch_size)
-    mlflow.log_param("epochs", num_epochs)
-
-    for epoch in range(num_epochs):
-        model.train()
-        epoch_loss = 0.0
-
-        for images, masks in loader:
-            images = images.to(device)
-            masks = masks.to(device)
-
-            outputs = model(images)
-            loss = criterion(outputs, masks)
-
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
-
-            epoch_loss += loss.item()
-
-        avg_loss = epoch_loss / len(loader)
-        print(f"[Epoch {epoch+1}] Loss: {avg_loss:.4f}")
-        mlflow.log_metric("loss", avg_loss, step=epoch)
-
-    # 모델 저장
-    mlflow.pytorch.log_model(model, "model")
-
-    # 예측 이미지 저장
-    model.eval()
-    sample, _ = next(iter(loader))
-    with torch.no_grad():
-        pred = model(sample.to(device))
-    pred_np = pred[0][0].cpu().numpy()
-    import matplotlib.pyplot as plt
-    os.makedirs("outputs", exist_ok=True)
-    plt.imsave("outputs/predicted.png", pred_np, cmap='gray')
-    mlflow.log_artifact("outputs/predicted.png")
+experiment_id = dist.broadcast(
+    mlflow.set_experiment(os.getenv("experiment_name", "unet-lung-segmentation")).experiment_id if dist.is_main else None)
+
+# Job 재시도(backoff_limit)로 다시 시작된 경우 같은 run에 이어서 기록
+resume_run_id = dist.broadcast(find_resumable_run(experiment_id, job_name) if dist.is_main else None)
+checkpointer = Checkpointer(args, job_name, main=dist.is_main)
+# 검증 dice 기준
+stopper = EarlyStopping(args, mode="max", pruner=MedianPruner(args, experiment_id, "val_dice"), dist=dist)
+
+with mlflow.start_run(run_id=resume_run_id) if dist.is_main else nullcontext() as run:
+    run_id = run.info.run_id if run else resume_run_id
+    start_epoch = 0
+    state = checkpointer.load(run_id, map_location=device) if resume_run_id else None
+    if state:
+        trainer.load_state_dict(state)
+        if "early_stop" in state:
+            stopper.load_state_dict(state["early_stop"])
+        start_epoch = state["epoch"] + 1
+        if dist.is_main:
+            print(f"[INFO] Resuming run {run_id} from epoch {start_epoch + 1}")
+            mlflow.set_tag("resumed_from_epoch", start_epoch)
+    elif dist.is_main:
+        mlflow.set_tag("job_name", job_name)
+        # sweep trial이면 sweep_id / trial 번호 / 부모 run
+        mlflow.set_tags(run_tags())
+        mlflow.log_param("lr", lr)
+        mlflow.log_param("batch_size", batch_size)
+        mlflow.log_param("epochs", num_epochs)
+        mlflow.log_param("unet_base", args.unet_base)
+        mlflow.log_param("unet_depth", args.unet_depth)
+        mlflow.log_param("separable", args.separable)
+        mlflow.log_param("batchnorm", args.batchnorm)
+        mlflow.log_param("bilinear", args.bilinear)
+        mlflow.log_param("num_params", sum(p.numel() for p in model.parameters()))
+        mlflow.log_param("num_workers", args.num_workers)
+        mlflow.log_param("precision", precision.name)
+        mlflow.log_param("channels_last", args.channels_last)
+        mlflow.log_param("patience", args.patience)
+        mlflow.log_param("max_minutes", args.max_minutes)
+        mlflow.log_param("val_fraction", args.val_fraction)
+        mlflow.log_param("stratify", args.stratify)
+        mlflow.log_param("train_size", len(train_set))
+        mlflow.log_param("val_size", len(val_set))
+        mlflow.log_param("world_size", dist.world_size)
+        mlflow.log_param("augment", args.augment)
+        if args.augment:
+            mlflow.log_params(trainer.augment.params)
+
+    for epoch in range(start_epoch, num_epochs):
+        # 이미 early stop으로 끝난 run을 재시도한 경우
+        if stopper.reason:
+            break
+
+        trainer.train_epoch(loader, epoch)
+        if val_loader:
+            results = trainer.evaluate(val_loader, epoch, val_metrics)
+            if stopper.update(results["dice"], epoch, model) and checkpointer.enabled:
+                checkpointer.save({"model": stopper.best_state, "epoch": epoch}, BEST_FILE)
+
+        stop_reason = stopper.check(epoch)
+        if checkpointer.should_save(epoch) or (stop_reason and checkpointer.enabled):
+            checkpointer.save({**trainer.state_dict(), "epoch": epoch, "early_stop": stopper.state_dict()})
+        if stop_reason:
+            break
+
+    # 모델 저장 / 예측 이미지는 rank 0만
+    if dist.is_main:
+        mlflow.set_tag("stop_reason", stopper.reason or "completed")
+        if stopper.restore_best(model, checkpointer, run_id):
+            mlflow.log_metrics({"best_epoch": stopper.best_epoch + 1, "best_val_dice": stopper.best})
+
+        # 모델 저장 (검증 dice가 가장 좋았던 weights)
+        mlflow.pytorch.log_model(model, "model")
+
+        # 예측 이미지 저장
+        model.eval()
+        sample, _ = next(iter(val_loader or loader))
+        with torch.no_grad(), precision.autocast():
+            pred = torch.sigmoid(model(precision.prepare_input(to_float(sample.to(device)))))
+        pred_np = pred[0][0].float().cpu().numpy()
+        import matplotlib.pyplot as plt
+        os.makedirs("outputs", exist_ok=True)
+        plt.imsave("outputs/predicted.png", pred_np, cmap='gray')
+        mlflow.log_artifact("outputs/predicted.png")
+
+dist.close()
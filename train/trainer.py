@@ -0,0 +1,279 @@
+# trainer.py
+# UNet / classifier 학습 스크립트가 같이 쓰는 epoch 루프
+# step마다 데이터 대기 / forward+backward 시간, 처리량, GPU 메모리 peak를 재고
+# MLflow에는 log_batch로 모아서 보냄 (metric 하나당 HTTP 요청 하나가 되지 않도록)
+
+import time
+from contextlib import nullcontext
+import torch
+import mlflow
+from mlflow.entities import Metric
+from mlflow.tracking import MlflowClient
+from loader import to_device
+from distributed import Distributed
+
+# MLflow log_batch 한 번에 보낼 수 있는 metric 최대 개수
+MAX_BATCH_METRICS = 1000
+
+
+def add_trainer_args(parser):
+    parser.add_argument("--log_every", type=int, default=20, help="Log step metrics every N steps")
+
+
+class MetricBuffer:
+    """metric을 모아 두었다가 flush()에서 log_batch로 한 번에 기록"""
+
+    def __init__(self, flush_size=MAX_BATCH_METRICS):
+        self.flush_size = flush_size
+        self.metrics = []
+
+    def log(self, metrics, step):
+        timestamp = int(time.time() * 1000)
+        for key, value in metrics.items():
+            self.metrics.append(Metric(key, float(value), timestamp, step))
+        if len(self.metrics) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        run = mlflow.active_run()
+        if run is None or not self.metrics:
+            return
+        # tracking URI가 설정된 뒤에 만들어지도록 flush 시점에 생성
+        client = MlflowClient()
+        for i in range(0, len(self.metrics), MAX_BATCH_METRICS):
+            client.log_batch(run.info.run_id, metrics=self.metrics[i:i + MAX_BATCH_METRICS])
+        self.metrics = []
+
+
+class StepTimer:
+    """forward/backward 시간 측정
+
+    CUDA에선 event를 기록만 해두고 로그 구간 끝에서 한 번만 동기화해서
+    매 step마다 GPU 파이프라인이 멈추지 않도록 함
+    """
+
+    def __init__(self, device):
+        self.cuda = device.type == "cuda"
+        self.pending = []
+        self.elapsed = 0.0
+
+    def start(self):
+        if self.cuda:
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+            return event
+        return time.perf_counter()
+
+    def stop(self, start):
+        if self.cuda:
+            end = torch.cuda.Event(enable_timing=True)
+            end.record()
+            self.pending.append((start, end))
+        else:
+            self.elapsed += time.perf_counter() - start
+
+    def collect(self):
+        """지금까지 누적된 시간(초)을 돌려주고 초기화"""
+        if self.pending:
+            self.pending[-1][1].synchronize()
+            self.elapsed += sum(s.elapsed_time(e) for s, e in self.pending) / 1000
+            self.pending = []
+        elapsed, self.elapsed = self.elapsed, 0.0
+        return elapsed
+
+
+class Trainer:
+    """한 epoch 학습 + step 단위 계측
+
+    prepare(x, y)는 디바이스로 옮긴 배치를 모델 입력 형태로 바꾸는 함수 (예: uint8 → float)
+    augment(x, y)는 학습 배치에만 prepare 전에 적용 (augment.py PairedAugment)
+    dist(Distributed)가 있으면 model은 DDP로 감싼 모델 - epoch / 검증 지표는 모든 rank 합으로 계산하고 기록은 rank 0만
+    """
+
+    def __init__(self, model, optimizer, criterion, precision, device, prepare=None, log_every=20, loss_name="train_loss",
+                 dist=None, augment=None):
+        self.model = model
+        # 검증 / state_dict는 DDP 래퍼 없이 (체크포인트 키에 "module." 접두사가 붙지 않도록)
+        self.module = Distributed.unwrap(model)
+        self.dist = dist
+        self.main = dist is None or dist.is_main
+        self.optimizer = optimizer
+        self.criterion = criterion
+        self.precision = precision
+        self.device = device
+        self.prepare = prepare
+        self.augment = augment
+        self.log_every = log_every
+        self.loss_name = loss_name
+        self.global_step = 0
+        self.metrics = MetricBuffer()
+
+    def log(self, metrics, step):
+        if self.main:
+            self.metrics.log(metrics, step)
+
+    def _sum(self, *values):
+        """rank별 값 합 (단일 프로세스면 그대로)"""
+        totals = torch.stack([torch.as_tensor(v, dtype=torch.float64, device=self.device) for v in values])
+        if self.dist is not None:
+            self.dist.all_reduce(totals)
+        return totals.tolist()
+
+    def train_epoch(self, loader, epoch):
+        model, precision = self.model, self.precision
+        model.train()
+        # DistributedSampler는 epoch마다 다른 순서로 섞이도록 알려줘야 함
+        sampler = getattr(loader, "sampler", None)
+        if hasattr(sampler, "set_epoch"):
+            sampler.set_epoch(epoch)
+        cuda = self.device.type == "cuda"
+        if cuda:
+            torch.cuda.reset_peak_memory_stats(self.device)
+
+        timer = StepTimer(self.device)
+        epoch_start = time.perf_counter()
+        epoch_loss = torch.zeros((), device=self.device)
+        epoch_wait = 0.0
+        epoch_samples = 0
+        epoch_steps = 0
+
+        # 로그 구간(log_every step) 누적값
+        window_loss = torch.zeros((), device=self.device)
+        window_wait = 0.0
+        window_samples = 0
+        window_steps = 0
+        window_start = time.perf_counter()
+
+        join = self.dist.join(model) if self.dist is not None else nullcontext()
+        with join:
+            it = iter(loader)
+            while True:
+                wait_start = time.perf_counter()
+                try:
+                    batch = next(it)
+                except StopIteration:
+                    break
+                wait = time.perf_counter() - wait_start
+
+                x, y = to_device(batch, self.device)
+                if self.augment:
+                    x, y = self.augment(x, y)
+                if self.prepare:
+                    x, y = self.prepare(x, y)
+                x = precision.prepare_input(x)
+
+                start = timer.start()
+                with precision.autocast():
+                    outputs = model(x)
+                    loss = self.criterion(outputs, y)
+                precision.backward_step(loss, self.optimizer)
+                timer.stop(start)
+
+                self.global_step += 1
+                # .item()은 GPU 동기화를 일으키므로 텐서로 누적하고 로그 시점에만 꺼냄
+                loss = loss.detach()
+                epoch_loss += loss
+                window_loss += loss
+                epoch_wait += wait
+                window_wait += wait
+                epoch_samples += x.size(0)
+                epoch_steps += 1
+                window_samples += x.size(0)
+                window_steps += 1
+
+                if window_steps == self.log_every:
+                    self._log_window(timer, window_loss, window_wait, window_samples, window_steps, window_start)
+                    window_loss.zero_()
+                    window_wait = 0.0
+                    window_samples = 0
+                    window_steps = 0
+                    window_start = time.perf_counter()
+
+        if window_steps:
+            self._log_window(timer, window_loss, window_wait, window_samples, window_steps, window_start)
+
+        epoch_time = time.perf_counter() - epoch_start
+        # 스트리밍 데이터셋은 워커별 마지막 배치 때문에 len(loader)와 실제 step 수가 다를 수 있음
+        # DDP면 loss / 처리량은 전체 rank 기준 (data wait은 rank 0 기준)
+        epoch_loss, epoch_steps, epoch_samples = self._sum(epoch_loss, epoch_steps, epoch_samples)
+        avg_loss = epoch_loss / max(epoch_steps, 1)
+        epoch_metrics = {
+            self.loss_name: avg_loss,
+            "data_wait_sec": epoch_wait,
+            "epoch_time_sec": epoch_time,
+            "samples_per_sec": epoch_samples / epoch_time if epoch_time > 0 else 0.0,
+        }
+        if cuda:
+            epoch_metrics["gpu_mem_peak_mb"] = torch.cuda.max_memory_allocated(self.device) / 2 ** 20
+        self.log(epoch_metrics, epoch)
+        self.metrics.flush()
+
+        if self.main:
+            print(f"[Epoch {epoch+1}] Loss: {avg_loss:.4f} "
+                  f"(data wait: {epoch_wait:.2f}s, epoch: {epoch_time:.1f}s, "
+                  f"{epoch_metrics['samples_per_sec']:.1f} samples/s)")
+        return avg_loss
+
+    @torch.no_grad()
+    def evaluate(self, loader, epoch, metrics=None, prefix="val"):
+        """검증 loss + metrics(update/compute/reset/sync 객체) 계산 후 로깅
+
+        DDP면 rank마다 자기 몫만 평가하고 합계를 all-reduce (DDP 래퍼를 거치지 않아서 rank별 배치 수가 달라도 됨)
+        """
+        model, precision = self.module, self.precision
+        model.eval()
+        if metrics is not None:
+            metrics.reset()
+
+        start = time.perf_counter()
+        total_loss = torch.zeros((), device=self.device)
+        steps = 0
+        for batch in loader:
+            steps += 1
+            x, y = to_device(batch, self.device)
+            if self.prepare:
+                x, y = self.prepare(x, y)
+            with precision.autocast():
+                outputs = model(precision.prepare_input(x))
+                total_loss += self.criterion(outputs, y)
+            if metrics is not None:
+                metrics.update(outputs.float(), y)
+
+        total_loss, steps = self._sum(total_loss, steps)
+        results = {"loss": total_loss / max(steps, 1)}
+        if metrics is not None:
+            if self.dist is not None:
+                metrics.sync(self.dist)
+            results.update(metrics.compute())
+        self.log({f"{prefix}_{k}": v for k, v in results.items()}, epoch)
+        self.log({f"{prefix}_time_sec": time.perf_counter() - start}, epoch)
+        self.metrics.flush()
+
+        if self.main:
+            print(f"[Epoch {epoch+1}] {prefix}: " + ", ".join(f"{k} {v:.4f}" for k, v in results.items()))
+        return results
+
+    def _log_window(self, timer, loss, wait, samples, steps, start):
+        compute = timer.collect()
+        elapsed = time.perf_counter() - start
+        self.log({
+            f"{self.loss_name}_step": float(loss) / steps,
+            "step_data_wait_ms": wait / steps * 1000,
+            "step_compute_ms": compute / steps * 1000,
+            "step_samples_per_sec": samples / elapsed if elapsed > 0 else 0.0,
+        }, self.global_step)
+
+    def state_dict(self):
+        return {
+            "model": self.module.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scaler": self.precision.scaler.state_dict(),
+            "step": self.global_step,
+        }
+
+    def load_state_dict(self, state):
+        self.module.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        if state["scaler"]:
+            self.precision.scaler.load_state_dict(state["scaler"])
+        self.global_step = state["step"]
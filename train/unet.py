@@ -4,60 +4,99 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-class UNet(nn.Module):
-    def __init__(self):
-        super(UNet, self).__init__()
 
-        def conv_block(in_channels, out_channels):
-            return nn.Sequential(
-                nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
-                nn.ReLU(inplace=True),
-                nn.Conv2d(out_channels, out_channels, kernel_size=3, padding=1),
-                nn.ReLU(inplace=True)
-            )
-
-        self.enc1 = conv_block(1, 64)
-        self.enc2 = conv_block(64, 128)
-        self.enc3 = conv_block(128, 256)
-        self.enc4 = conv_block(256, 512)
+def str2bool(v):
+    # loader.str2bool과 같음 - 저장된 모델을 unpickle할 때 unet.py 하나만 있으면 되도록 다른 학습 모듈을 import하지 않음
+    return str(v).lower() in ("1", "true", "yes", "y")
 
-        self.pool = nn.MaxPool2d(2)
 
-        self.bottleneck = conv_block(512, 1024)
+def add_model_args(parser):
+    parser.add_argument("--unet_base", type=int, default=64, help="Channels of the first UNet level")
+    parser.add_argument("--unet_depth", type=int, default=4, help="Number of down/up-sampling levels")
+    parser.add_argument("--separable", type=str2bool, default=False, help="Depthwise-separable 3x3 convs")
+    parser.add_argument("--batchnorm", type=str2bool, default=False, help="BatchNorm after each conv")
+    parser.add_argument("--bilinear", type=str2bool, default=False,
+                        help="Bilinear upsampling + 1x1 conv instead of ConvTranspose2d")
 
-        self.up4 = nn.ConvTranspose2d(1024, 512, kernel_size=2, stride=2)
-        self.dec4 = conv_block(1024, 512)
 
-        self.up3 = nn.ConvTranspose2d(512, 256, kernel_size=2, stride=2)
-        self.dec3 = conv_block(512, 256)
+def build_unet(args):
+    return UNet(
+        base=args.unet_base,
+        depth=args.unet_depth,
+        separable=args.separable,
+        batchnorm=args.batchnorm,
+        bilinear=args.bilinear,
+    )
 
-        self.up2 = nn.ConvTranspose2d(256, 128, kernel_size=2, stride=2)
-        self.dec2 = conv_block(256, 128)
 
-        self.up1 = nn.ConvTranspose2d(128, 64, kernel_size=2, stride=2)
-        self.dec1 = conv_block(128, 64)
+def conv3x3(in_channels, out_channels, separable):
+    if separable and in_channels > 1:
+        # depthwise 3x3 + pointwise 1x1 (파라미터 / 연산량 약 1/8 ~ 1/9)
+        return nn.Sequential(
+            nn.Conv2d(in_channels, in_channels, kernel_size=3, padding=1, groups=in_channels, bias=False),
+            nn.Conv2d(in_channels, out_channels, kernel_size=1),
+        )
+    return nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1)
 
-        self.final = nn.Conv2d(64, 1, kernel_size=1)  # binary segmentation → channel=1
 
-    def forward(self, x):
-        e1 = self.enc1(x)
-        e2 = self.enc2(self.pool(e1))
-        e3 = self.enc3(self.pool(e2))
-        e4 = self.enc4(self.pool(e3))
+class UNet(nn.Module):
+    """기본값(base=64, depth=4, 나머지 off)은 기존 UNet과 같은 구조 / state_dict 키"""
 
-        b = self.bottleneck(self.pool(e4))
+    def __init__(self, base=64, depth=4, separable=False, batchnorm=False, bilinear=False,
+                 in_channels=1, out_channels=1):
+        super(UNet, self).__init__()
+        self.depth = depth
 
-        d4 = self.up4(b)
-        d4 = self.dec4(torch.cat([d4, e4], dim=1))
+        def conv_block(in_channels, out_channels):
+            layers = []
+            for c_in in (in_channels, out_channels):
+                layers.append(conv3x3(c_in, out_channels, separable))
+                if batchnorm:
+                    layers.append(nn.BatchNorm2d(out_channels))
+                layers.append(nn.ReLU(inplace=True))
+            return nn.Sequential(*layers)
+
+        def up_block(in_channels, out_channels):
+            if bilinear:
+                return nn.Sequential(
+                    nn.Upsample(scale_factor=2, mode="bilinear", align_corners=False),
+                    nn.Conv2d(in_channels, out_channels, kernel_size=1),
+                )
+            return nn.ConvTranspose2d(in_channels, out_channels, kernel_size=2, stride=2)
+
+        channels = [base * 2 ** i for i in range(depth + 1)]
+
+        # enc1..encN / up1..upN / dec1..decN (기존 체크포인트와 같은 이름)
+        prev = in_channels
+        for i in range(depth):
+            setattr(self, f"enc{i + 1}", conv_block(prev, channels[i]))
+            prev = channels[i]
+
+        self.pool = nn.MaxPool2d(2)
+
+        self.bottleneck = conv_block(channels[depth - 1], channels[depth])
+
+        for i in range(depth, 0, -1):
+            setattr(self, f"up{i}", up_block(channels[i], channels[i - 1]))
+            setattr(self, f"dec{i}", conv_block(channels[i], channels[i - 1]))
+
+        self.final = nn.Conv2d(base, out_channels, kernel_size=1)  # binary segmentation → channel=1
+
+    def forward(self, x):
+        # 이전 버전으로 pickle 된 모델(MLflow)엔 depth 속성이 없음
+        depth = getattr(self, "depth", 4)
 
-        d3 = self.up3(d4)
-        d3 = self.dec3(torch.cat([d3, e3], dim=1))
+        skips = []
+        for i in range(1, depth + 1):
+            x = getattr(self, f"enc{i}")(x if i == 1 else self.pool(x))
+            skips.append(x)
 
-        d2 = self.up2(d3)
-        d2 = self.dec2(torch.cat([d2, e2], dim=1))
+        x = self.bottleneck(self.pool(x))
 
-        d1 = self.up1(d2)
-        d1 = self.dec1(torch.cat([d1, e1], dim=1))
+        for i in range(depth, 0, -1):
+            x = getattr(self, f"up{i}")(x)
+            x = getattr(self, f"dec{i}")(torch.cat([x, skips[i - 1]], dim=1))
 
-        out = torch.sigmoid(self.final(d1))
+        # logits 반환 (sigmoid는 BCEWithLogitsLoss / 추론 시 적용 → autocast에서도 안전)
+        out = self.final(x)
         return out